@@ -1,10 +1,11 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Query
+from fastapi.responses import ORJSONResponse
 from util.versionstamp import versionid
 
 
-app = FastAPI()
-@app.get("/event/{event_id}")
-async def get_event(event_id: versionid, filter: str | None):
+app = FastAPI(default_response_class=ORJSONResponse)
+@app.get("/event/{event_id}", response_class=ORJSONResponse, response_model=None)
+async def get_event(event_id: versionid, filter: str | None = Query(None)):
     return {
             "event_id": event_id,
             "event_name" : "sample_event",
@@ -1,3 +1,4 @@
+import sys
 from src.sample import Sample
 from src.actor import Actor
 from src.event import *
@@ -87,10 +88,10 @@ if __name__ == "__main__":
         base_log.info("Sample created", sample_name=sample.name, sample_id=sample.id)
         print("sample is valid?", sample.valid_graph()) 
         sample.plot_graph()
-        for event in sample.events:
-            # print with formatting
-            print(f"Event in sample: {event.id}, {event.name}, {event.type}")
-            
-
-            base_log.info("Event in sample", event_id=event.id, event_name=event.name, event_type=event.type)
+        # One write for the whole listing rather than a print per event
+        sys.stdout.write("".join(f"Event in sample: {event.id}, {event.name}, {event.type}\n" for event in sample.events))
+        # One record per event; hand them to the handlers together
+        with base_log.batch():
+            for event in sample.events:
+                base_log.info("Event in sample", event_id=event.id, event_name=event.name, event_type=event.type)
 
@@ -1,10 +1,27 @@
-from copy import deepcopy
 from time import time_ns
-from typing import Any, Optional, Dict, List
+from typing import Any, Optional, Dict, List, NamedTuple
 from util.versionstamp import versionstamp
 from enum import Enum
 
 vm = versionstamp()
+_time_ns = time_ns
+
+def _clone(value: Any) -> Any:
+    # Contents are nested dicts/lists of plain values, so only the containers
+    # need copying; everything else is shared as-is
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value
+
+
+class Version(NamedTuple):
+    # Immutable, so the history can be handed out without copying each entry
+    v: int
+    description: str
+    created_at: int
+
 
 class ActorStatus(Enum):
     OCCUPIED = "occupied",
@@ -14,6 +31,11 @@ class ActorStatus(Enum):
 
 
 class BaseActor:
+    __slots__ = (
+        'id', 'name', 'status', 'tags', 'description', '_contents',
+        'created_at', 'updated_at', '_versioning',
+    )
+
     def __init__(
             self,
             name: str,
@@ -22,30 +44,23 @@ class BaseActor:
             status: ActorStatus = ActorStatus.IDLE,
             **contents: Any
             ):
+        now = _time_ns() // 1_000
         self.id = vm()
         self.name = name
         self.status = status
         self.tags = [] if tags is None else tags
         self.description = description
         self._contents = contents
-        self.created_at = time_ns() // 1_000
+        self.created_at = now
         # Updated by the database on `save`
         self.updated_at = None
-        self._versioning = [{
-                "v": 1,
-                "description": "ver: 1",
-                "created_at": time_ns() // 1_000,
-                }]
+        self._versioning = [Version(1, "ver: 1", now)]
 
     def current_version(self):
-        return self._versioning[-1]["v"]
+        return self._versioning[-1].v
 
     def version(self, description: str):
-        self._versioning.append({
-            "v": self.current_version() + 1,
-            "description": description,
-            "created_at": time_ns() // 1_000,
-        })
+        self._versioning.append(Version(self.current_version() + 1, description, _time_ns() // 1_000))
 
     def to_dict(self):
         return {
@@ -54,10 +69,10 @@ class BaseActor:
             "status": self.status.value[0],
             "tags": self.tags,
             "description": self.description,
-            "contents": deepcopy(self._contents),
+            "contents": _clone(self._contents),
             "created_at": self.created_at,
             "updated_at": self.updated_at,
-            "versioning": deepcopy(self._versioning),
+            "versioning": [version._asdict() for version in self._versioning],
         }
 
     def from_dict(self):
@@ -66,11 +81,11 @@ class BaseActor:
             description=self.description,
             tags=self.tags,
             status=self.status,
-            **deepcopy(self._contents)
+            **_clone(self._contents)
         )
 
     def save(self):
-        self.updated_at = time_ns() // 1_000
+        self.updated_at = _time_ns() // 1_000
         # View handles the save
         # from src.view import View
         # View.add(entry=self, "update")
@@ -79,6 +94,8 @@ class BaseActor:
 
 
 class Actor(BaseActor):
+    __slots__ = ()
+
     def __init__(
             self,
             name: str,
@@ -1,9 +1,7 @@
 from typing import List, Optional
-from pydantic import BaseModel, Field
 from src.view import BaseView
-from src.ingredient import Ingredient
-from src.event import Material
-from src.experiment import BaseExperiment
+from src.event import Ingredient, Material
+from src.experiment import Experiment
 from util.versionstamp import versionstamp
 from time import time_ns
 """
@@ -16,14 +14,14 @@ The configuration class defines the lab administrative settings and labels:
 """
 
 vm = versionstamp()
-class Lab(BaseModel):
+class Lab:
     def __init__(
             self,
             lab_name: str,
             lab_code: str,
             lab_location: str,
             description: str = "",
-            views: Optional[List[BaseView]] = [],
+            views: Optional[List[BaseView]] = None,
             **contents,
             ):
 
@@ -31,7 +29,7 @@ class Lab(BaseModel):
         self.lab_code = lab_code
         self.lab_location = lab_location
         self.id = vm()
-        self.created_at = time_ns() / 1_000
+        self.created_at = time_ns() // 1_000
         self.updated_at = None
         self.description = description
         self._contents = contents
@@ -41,7 +39,8 @@ class Lab(BaseModel):
         # TODO: Implement once DB connection is created
         self.updated_at = time_ns() // 1_000
 
-    def sample_material_name(self, sample: Experiment):
-        name: str = f"{lab_code}.{lab_location[0:3]}.:
+    def sample_material_name(self, sample: Experiment) -> str:
+        name: str = f"{self.lab_code}.{self.lab_location[0:3]}.:"
+        return name
 
 
@@ -1,33 +1,249 @@
-from typing import List, Dict, Any, Literal, Optional, Union, Tuple
+import sys
+from typing import List, Dict, Any, Callable, Literal, Optional, Union, Tuple, Iterator, Type, Set, Deque, cast
 from time import time_ns
-from util.log import Log
+from util.log import Log, get_log
 from util.versionstamp import versionstamp, versionid
-from abc import ABC, abstractmethod
+from enum import IntEnum
+from types import MappingProxyType, new_class
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from hashlib import blake2b
 from src.actor import Actor
 from src.task import Task
 
 vm = versionstamp()
-
-class EventList(List['BaseEvent']):
-    def append(self, value: Union['BaseEvent', Dict[str, Any]]) -> None:
-        if isinstance(value, BaseEvent):
-            super().append(value)
-        elif isinstance(value, dict):
-            event = BaseEvent.from_dict(value)
-            super().append(event)
-        else:
-            self.log.error("Value must be a BaseEvent or a dict representation of one.")
+_time_ns = time_ns
+
+
+class EventTypeCode(IntEnum):
+    ACTION = 0
+    MATERIAL = 1
+    MEASUREMENT = 2
+    ANALYSIS = 3
+    UNKNOWN = 4 # Stub edges whose type was not recorded
+
+_TYPE_CODES = {code.name.lower(): code for code in EventTypeCode}
+# Event types and tags come from a small vocabulary; interning makes their comparisons pointer checks
+_TYPES = {t: sys.intern(t) for t in ("action", "material", "measurement", "analysis")}
+_VALID_TYPES = frozenset(_TYPES)
+
+# Bitmasks of the neighbour type codes each event type allows; test with `(1 << code) & mask`
+_ACTION_BIT = 1 << EventTypeCode.ACTION
+_MATERIAL_BIT = 1 << EventTypeCode.MATERIAL
+_MEASUREMENT_BIT = 1 << EventTypeCode.MEASUREMENT
+_ANALYSIS_BIT = 1 << EventTypeCode.ANALYSIS
+
+MATERIAL_UP_MASK = _ACTION_BIT
+MATERIAL_DOWN_MASK = _ACTION_BIT | _MEASUREMENT_BIT
+ACTION_UP_MASK = _MATERIAL_BIT
+ACTION_DOWN_MASK = _MATERIAL_BIT | _MEASUREMENT_BIT
+MEASUREMENT_UP_MASK = _MATERIAL_BIT
+MEASUREMENT_DOWN_MASK = _ANALYSIS_BIT
+ANALYSIS_UP_MASK = _MEASUREMENT_BIT | _ANALYSIS_BIT
+ANALYSIS_DOWN_MASK = _ANALYSIS_BIT
+
+# Indexed by EventTypeCode
+UPSTREAM_MASKS = (ACTION_UP_MASK, MATERIAL_UP_MASK, MEASUREMENT_UP_MASK, ANALYSIS_UP_MASK)
+DOWNSTREAM_MASKS = (ACTION_DOWN_MASK, MATERIAL_DOWN_MASK, MEASUREMENT_DOWN_MASK, ANALYSIS_DOWN_MASK)
+
+_HISTORY_LIMIT = 1024
+
+# Event ids are drawn from a pre-stamped block, so the stamp lock and clock are hit
+# once per _ID_POOL_SIZE events; the pool pops from the end, hence stored reversed
+_ID_POOL_SIZE = 256
+_id_pool: List[versionid] = []
+
+def _reserve_ids(n: int) -> None:
+    # Top the pool up to at least n ids in one stamp batch; older pooled ids are still handed out first
+    missing = n - len(_id_pool)
+    if missing > 0:
+        ids = vm.batch(missing)
+        ids.reverse()
+        _id_pool[:0] = ids
+
+def _new_id() -> versionid:
+    try:
+        return _id_pool.pop()
+    except IndexError:
+        ids = vm.batch(_ID_POOL_SIZE)
+        rest = ids[1:]
+        rest.reverse()
+        _id_pool.extend(rest)
+        return ids[0]
+_NAMED_INGREDIENTS = 3 # Ingredients spelled out in a generated material name
+
+# Set inside BaseEvent.shared_timestamp(); None means each event reads the clock
+_shared_created_at: ContextVar[Optional[int]] = ContextVar("shared_created_at", default=None)
+
+# Events already rebuilt during the current from_dict call, by id, so an event
+# referenced from several places in one payload (a material under many measurements)
+# is rebuilt once
+_from_dict_memo: ContextVar[Optional[Dict[versionid, 'BaseEvent']]] = ContextVar("from_dict_memo", default=None)
+
+# Shared by every event constructed without parameters; set_parameter copies on write
+_EMPTY_PARAMETERS = MappingProxyType({})
+
+# Edge sentinel shared by events that have no neighbours yet; replaced by a list on first insert
+_NO_EDGES = ()
+
+# Events with identical metadata (lot numbers, SOP ids, ...) share one read-only mapping.
+# Keys carry the exact type of every value, nested ones included, so 1, 1.0 and True
+# (or (10, 10) and (10.0, 10.0)) stay distinct; only scalars and tuples/frozensets of
+# them are shared, since other types may compare equal across types.
+_CONTENTS_CACHE: Dict[frozenset, MappingProxyType] = {}
+_CONTENTS_CACHE_LIMIT = 4096
+_EMPTY_CONTENTS = MappingProxyType({})
+_NO_TAGS = () # Shared by untagged events
+_SHAREABLE_SCALARS = frozenset((str, int, bool, type(None)))
+
+def _contents_key(value: Any) -> Optional[Tuple[type, Any]]:
+    # Type-tagged key for one contents value, or None when it must not be shared
+    value_type = type(value)
+    if value_type in _SHAREABLE_SCALARS:
+        return (value_type, value)
+    if value_type is float:
+        return (float, value.hex()) # 0.0 == -0.0, but they are not the same value
+    if value_type is tuple or value_type is frozenset:
+        keys = [_contents_key(item) for item in value]
+        if any(key is None for key in keys):
+            return None
+        return (value_type, tuple(keys) if value_type is tuple else frozenset(keys))
+    return None
+
+def _shared_contents(contents: Dict[str, Any]) -> Union[Dict[str, Any], MappingProxyType]:
+    if not contents:
+        return _EMPTY_CONTENTS
+    keys = []
+    for k, v in contents.items():
+        value_key = _contents_key(v)
+        if value_key is None: # Anything else is kept as a private dict
+            return contents
+        keys.append((k, value_key))
+    key = frozenset(keys)
+    shared = _CONTENTS_CACHE.get(key)
+    if shared is None:
+        shared = MappingProxyType(contents)
+        if len(_CONTENTS_CACHE) < _CONTENTS_CACHE_LIMIT:
+            _CONTENTS_CACHE[key] = shared
+    return shared
+
+def _link(parent: 'BaseEvent', child: 'BaseEvent') -> None:
+    # Record a parent -> child edge on both endpoints; callers pass known events
+    downstream = parent.downstream
+    if not isinstance(downstream, list): # Still the shared _NO_EDGES
+        downstream = parent.downstream = []
+    downstream.append(child)
+    upstream = child.upstream
+    if not isinstance(upstream, list):
+        upstream = child.upstream = []
+    upstream.append(parent)
+
+
+def _any_not_in(events: 'EdgeList', mask: int) -> bool:
+    # True when some event's type code is outside mask; a plain loop beats any() over a generator
+    for event in events:
+        if not (mask >> event.type_code) & 1:
+            return True
+    return False
+
+
+def _ref_id(ref: Any) -> Optional[versionid]:
+    # Id of an edge ref: an event, an id-only {"event_id", "type"} dict or a full event dict
+    if isinstance(ref, BaseEvent):
+        return ref.id
+    if isinstance(ref, dict):
+        return ref.get("event_id", ref.get("id"))
+    return None
+
+def _unlinked(refs: List[Any], edges: 'EdgeList') -> List[Any]:
+    # Drop edge refs whose id is already among edges
+    linked = {edge.id for edge in edges}
+    return [ref for ref in refs if _ref_id(ref) not in linked]
+
+
+def _adopt(edges: 'EdgeList', event: 'BaseEvent') -> None:
+    # A neighbour rebuilt from its own record holds a stub for event, and linking the
+    # two appended event as well; put event in the stub's place and drop the duplicate
+    if not isinstance(edges, list): # No edges yet, so no stub either
+        return
+    for i, edge in enumerate(edges):
+        if edge.id == event.id and type(edge) is _StubEvent:
+            edges[i] = event
+            for j in range(len(edges) - 1, i, -1):
+                if edges[j] is event:
+                    del edges[j]
+                    break
             return
 
-    def get(self, index: int) -> Union['BaseEvent', Dict[str, Any]]:
-        if 0 <= index < len(self):
-            return self[index]
-        else:
-            raise IndexError("Index out of range.")
 
+def _coerce_event(value: Any) -> Optional['BaseEvent']:
+    # Events pass straight through; full event dicts are rebuilt via from_dict
+    if isinstance(value, BaseEvent):
+        return value
+    if isinstance(value, dict):
+        return BaseEvent.from_dict(value)
+    return None
+
+
+class _StubEvent:
+    # Stands in for an edge recorded as just an id and type, e.g. from a serialised event
+    __slots__ = ('id', 'type', 'type_code')
+    id: versionid
+    type: str
+    type_code: int
+    # Edges of a stub are unknown
+    upstream: Tuple['Edge', ...] = _NO_EDGES
+    downstream: Tuple['Edge', ...] = _NO_EDGES
+
+    def __init__(self, id: versionid, type: str):
+        self.id = id
+        self.type = type
+        self.type_code = _TYPE_CODES.get(type, EventTypeCode.UNKNOWN)
+
+
+# An edge is a live event or an id-only stub; a leaf keeps the shared _NO_EDGES tuple
+# until _upstream_list()/_downstream_list() swap in a list
+Edge = Union['BaseEvent', _StubEvent]
+EdgeList = Union[List[Edge], Tuple[Edge, ...]]
+
+
+class CycleError(ValueError):
+    def __init__(self, path: List[versionid]):
+        self.path = path
+        super().__init__(f"Cycle detected: {' -> '.join(path)}")
+
+
+class BaseEvent:
+    __slots__ = (
+        '_log_seed', '_log', 'id', '_hash', 'name', 'tags', 'task_id', 'parameters', 'created_at',
+        'updated_at', '_history', '_contents', 'type', 'type_code', 'upstream', 'downstream',
+    )
+    # Slot types, also set directly by _from_trusted_dict
+    id: versionid
+    _hash: int
+    _log_seed: Optional[Log]
+    _log: Optional[Log] # Built on first use by the log property
+    name: str
+    tags: Union[List[str], Tuple[()]]
+    task_id: Optional[versionid]
+    parameters: Union[Dict[str, Any], MappingProxyType]
+    created_at: int
+    updated_at: Optional[int]
+    _history: Optional[Deque[Any]] # Built on first access by the history property
+    _contents: Union[Dict[str, Any], MappingProxyType]
+    type: str
+    type_code: int
+    upstream: EdgeList
+    downstream: EdgeList
+    # event_type -> concrete class, filled as subclasses are defined; used by from_dict
+    _registry: Dict[str, Type['BaseEvent']] = {}
+
+    def __init_subclass__(cls, event_type: Optional[str] = None, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if event_type is not None:
+            BaseEvent._registry[event_type] = cls
 
-
-class BaseEvent(ABC):
     def __init__(
             self,
             name: str,
@@ -44,44 +260,78 @@ class BaseEvent(ABC):
             **contents: Any, # To capture any extra contents
         ):
 
-            if event_type is None or event_type not in ["action", "material", "measurement", "analysis"]:
+            if event_type is None or event_type not in _VALID_TYPES:
                 raise ValueError("event_type must be one of 'action', 'material', 'measurement', or 'analysis'.")
-            self.log = (log or Log(name)).with_context(event=name, event_type=event_type, event_id=self.id)
-
-            self.id = id if id is not None else vm()
-            self.name = name
-            self.tags = tags or []
+            self.id = id if id is not None else _new_id()
+            # __eq__ compares ids only, so the id alone is hashed
+            self._hash = hash(self.id)
+            # The contextual logger is built on first use; most events never log
+            self._log_seed = log
+            self._log = None
+
+            self.name = sys.intern(name)
+            self.tags = [sys.intern(tag) for tag in tags] if tags else _NO_TAGS
             self.task_id = task_id
-            self.parameters = parameters or {}
-            self.created_at = created_at if created_at is not None else time_ns() // 1_000
+            self.parameters = parameters if parameters else _EMPTY_PARAMETERS
+            if created_at is None:
+                created_at = _shared_created_at.get()
+                if created_at is None:
+                    created_at = _time_ns() // 1_000
+            self.created_at = created_at
             self.updated_at = updated_at
-            self.history = []
-            self._contents = contents # Store generic contents
-            self.type = event_type
-
-            # Initialize upstream and downstream as EventList,
-            # and use from_dict when adding initial items if they are dicts
-            self.upstream = EventList()
+            self._history = None # Built on first access; most events never record history
+            self._contents = _shared_contents(contents) # Store generic contents
+            self.type = _TYPES[event_type]
+            self.type_code = _TYPE_CODES[event_type]
+
+            # Leaf events keep the shared empty tuple; lists are allocated on first insert
+            # and from_dict is used when adding initial items if they are dicts
+            self.upstream = _NO_EDGES
             if upstream:
-                for item in upstream:
-                    if isinstance(item, dict) and "event_id" in item and "type" in item:
-                        self.add_upstream_id(item["event_id"], item.get("type")) # Use a new method to add just ID
-                    else:
-                        # If it's already a BaseEvent or a full event dict, it will be handled by EventList.append
-                        self.upstream.append(item)
-
+                self._load_edges(upstream, self._upstream_list(), self.add_upstream_id)
 
-            self.downstream = EventList()
+            self.downstream = _NO_EDGES
             if downstream:
-                for item in downstream:
-                    if isinstance(item, dict) and "event_id" in item and "type" in item:
-                        self.add_downstream_id(item["event_id"], item.get("type"))
-                    else:
-                        self.downstream.append(item)
+                self._load_edges(downstream, self._downstream_list(), self.add_downstream_id)
+
+
+    @classmethod
+    def specialize(cls, **fixed: Any) -> Type['BaseEvent']:
+        """
+        Return a subclass of this event type with `fixed` bound as keyword arguments, for
+        workflows that build the same shape repeatedly, e.g.
+        `Grind = Action.specialize(name="grind", actor=operator)` then `Grind(ingredients=[...])`.
+        Keyword arguments passed at construction still override the fixed ones.
+        """
+        base_init = cls.__init__
+
+        def __init__(self, *args: Any, **kwargs: Any):
+            base_init(self, *args, **{**fixed, **kwargs})
+
+        namespace = {"__slots__": (), "__init__": __init__, "__qualname__": cls.__qualname__}
+        return new_class(cls.__name__, (cls,), exec_body=lambda body: body.update(namespace))
 
+    def _log_context(self) -> Dict[str, Any]:
+        return {"event": self.name, "event_type": self.type, "event_id": self.id}
+
+    @property
+    def log(self) -> Log:
+        if self._log is None:
+            self._log = (self._log_seed or get_log(self.name)).with_context(**self._log_context())
+        return self._log
+
+    @log.setter
+    def log(self, log: Log) -> None:
+        self._log = log
+
+    @property
+    def history(self) -> Deque[Any]:
+        if self._history is None:
+            self._history = deque(maxlen=_HISTORY_LIMIT) # Append-only; oldest entries fall off
+        return self._history
 
     def __hash__(self):
-        return hash(self.name + str(self.id))
+        return self._hash
 
     def __eq__(self, other):
         if isinstance(other, BaseEvent):
@@ -91,199 +341,251 @@ class BaseEvent(ABC):
     def __repr__(self):
         return f"<{self.type} ** {self.name} ** {self.id}>"
 
+    @classmethod
+    @contextmanager
+    def shared_timestamp(cls) -> Iterator[int]:
+        # Read the clock once; events built inside the block without created_at share it
+        now = _time_ns() // 1_000
+        token = _shared_created_at.set(now)
+        try:
+            yield now
+        finally:
+            _shared_created_at.reset(token)
+
+    def set_parameter(self, key: str, value: Any) -> None:
+        if self.parameters is _EMPTY_PARAMETERS:
+            self.parameters = {}
+        # Only the shared empty mapping is read-only; any other is the event's own dict
+        cast(Dict[str, Any], self.parameters)[key] = value
+
+    @staticmethod
+    def validate_dag_from(root: 'BaseEvent') -> None:
+        """
+        Walk everything upstream of root and raise CycleError on the first cycle found.
+        Iterative DFS: ids on the current path are gray, fully explored ones are black.
+        """
+        on_path: Set[versionid] = {root.id}
+        explored: Set[versionid] = set()
+        stack: List[Tuple[Edge, Iterator[Edge]]] = [(root, iter(root.upstream))]
+        while stack:
+            event, neighbours = stack[-1]
+            for neighbour in neighbours:
+                neighbour_id = neighbour.id
+                if neighbour_id in on_path:
+                    path = [e.id for e, _ in stack]
+                    raise CycleError(path[path.index(neighbour_id):] + [neighbour_id])
+                if neighbour_id not in explored:
+                    on_path.add(neighbour_id)
+                    stack.append((neighbour, iter(neighbour.upstream)))
+                    break
+            else:
+                stack.pop()
+                on_path.discard(event.id)
+                explored.add(event.id)
+
     def save(self) -> Tuple[versionid, str, int]:
-        self.updated_at = time_ns() // 1_000
+        self.updated_at = _time_ns() // 1_000
         # save
         return (self.id, self.name, self.updated_at)
 
+    def _upstream_list(self) -> List[Edge]:
+        upstream = self.upstream
+        if not isinstance(upstream, list):
+            upstream = self.upstream = []
+        return upstream
+
+    def _downstream_list(self) -> List[Edge]:
+        downstream = self.downstream
+        if not isinstance(downstream, list):
+            downstream = self.downstream = []
+        return downstream
+
     def add_upstream_id(self, event_id: versionid, event_type: Optional[str] = None) -> None:
-        # Create a "stub" event object with just id and type for graph purposes
-        class StubEvent:
-            def __init__(self, id, type):
-                self.id = id
-                self.type = type
-        self.upstream.append(StubEvent(event_id, event_type or "unknown"))
+        self._upstream_list().append(_StubEvent(event_id, event_type or "unknown"))
 
 
     def add_downstream_id(self, event_id: versionid, event_type: Optional[str] = None) -> None:
-        class StubEvent:
-            def __init__(self, id, type):
-                self.id = id
-                self.type = type
-        self.downstream.append(StubEvent(event_id, event_type or "unknown"))
+        self._downstream_list().append(_StubEvent(event_id, event_type or "unknown"))
 
 
+    def _load_edges(self, items: List[Any], edges: List[Edge], add_id) -> None:
+        # Already-built events, the common case, land with a single list.extend
+        if all(isinstance(item, BaseEvent) for item in items):
+            edges.extend(items)
+            return
+        # Mixed input goes in one pass so edges keep the order they were given in
+        for item in items:
+            if isinstance(item, BaseEvent):
+                edges.append(item)
+                continue
+            if isinstance(item, dict) and "event_id" in item and "type" in item:
+                add_id(item["event_id"], item.get("type")) # Use a new method to add just ID
+                continue
+            event = _coerce_event(item)
+            if event is None:
+                self.log.error("Edge must be a BaseEvent or a dict representation of one.")
+                continue
+            edges.append(event)
+
+    def add_upstream_many(self, events: List[Union['BaseEvent', Dict[str, Any]]]) -> None:
+        self._load_edges(events, self._upstream_list(), self.add_upstream_id)
+
+    def add_downstream_many(self, events: List[Union['BaseEvent', Dict[str, Any]]]) -> None:
+        self._load_edges(events, self._downstream_list(), self.add_downstream_id)
+
     def add_upstream(self, event: Union['BaseEvent', Dict[str, Any]]) -> None:
-        if isinstance(event, BaseEvent):
-            self.upstream.append(event)
-        elif isinstance(event, dict):
-            event_obj = BaseEvent.from_dict(event)
-            self.upstream.append(event_obj)
-        else:
+        event_obj = _coerce_event(event)
+        if event_obj is None:
             self.log.error("Upstream event must be a BaseEvent or a dict representation of one.")
             return
+        self._upstream_list().append(event_obj)
 
     def add_downstream(self, event: Union['BaseEvent', Dict[str, Any]]) -> None:
-        if isinstance(event, BaseEvent):
-            self.downstream.append(event)
-        elif isinstance(event, dict):
-            # If it's a dict, use from_dict to get the actual event object
-            event_obj = BaseEvent.from_dict(event)
-            self.downstream.append(event_obj)
-        else:
+        event_obj = _coerce_event(event)
+        if event_obj is None:
             self.log.error("Downstream event must be a BaseEvent or a dict representation of one.")
             return
+        self._downstream_list().append(event_obj)
 
-    @abstractmethod
     def invalid(self) -> bool:
-        pass
+        # Each event type defines its own one-hop rules
+        raise NotImplementedError(f"{type(self).__name__} must implement invalid()")
 
-    def to_dict(self) -> Dict[str, Any]:
-        data = {
+    def to_row(self) -> Dict[str, Any]:
+        # The event's own fields without its edges, e.g. for flat tabular export
+        return {
             "id": self.id,
             "name": self.name,
             "event_type": self.type,
-            "tags": self.tags,
+            "tags": list(self.tags),
             "created_at": self.created_at,
             "updated_at": self.updated_at,
-            "contents": self._contents,
+            "contents": dict(self._contents),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            **self.to_row(),
             # For upstream/downstream, store minimal info to avoid deep recursion and for graph building
-            # If you need full event objects, you'd fetch them from a data store based on ID
-            "upstream": [{"event_id": e.id, "type": e.type} for e in self.upstream if hasattr(e, 'id') and hasattr(e, 'type')],
-            "downstream": [{"event_id": e.id, "type": e.type} for e in self.downstream if hasattr(e, 'id') and hasattr(e, 'type')],
+            # If you need full event objects, you'd fetch them from a data store based on ID.
+            # Edges are always events or _StubEvents, so id and type are guaranteed.
+            "upstream": [{"event_id": e.id, "type": e.type} for e in self.upstream],
+            "downstream": [{"event_id": e.id, "type": e.type} for e in self.downstream],
         }
         return data
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'BaseEvent':
         event_type = data.get("event_type")
-        if event_type == "material":
-            return Material(**data)
-        elif event_type == "action":
-            # For action, we need to handle actor and ingredients specially if they are dicts
-            # This requires Action's __init__ to also accept dicts for actor/ingredients
-            # Or, you'll need to reconstruct them here.
-            # Let's assume for now that if actor/ingredients are dicts, their respective classes have from_dict
-            # or Action's __init__ can handle dicts. If actor is a simple ID, it's fine.
-            # For now, let's pass a dummy actor if it's not provided or can't be reconstructed
-            actor_data = data.get('actor')
-            if actor_data and isinstance(actor_data, dict):
-                # Assuming Actor also has a from_dict or its init can take a dict
-                actor = Actor(**actor_data) # You'll need to define Actor's __init__ to handle this
-            elif actor_data: # If actor is just an ID string
-                 actor = Actor(name=f"Actor_{actor_data}") # Create a dummy actor
-            else:
-                actor = Actor(name="UnknownActor") # Default actor if none provided
-
-
-            # Ingredients also need to be handled carefully:
-            ingredients_data = data.get('ingredients', [])
-            ingredients = []
-            for ingr_data in ingredients_data:
-                if isinstance(ingr_data, dict):
-                    # You'll need `Ingredient.from_dict` or similar if ingredient is complex
-                    # For now, let's assume it's just material, amount, unit
-                    material_data = ingr_data.get('material')
-                    if material_data and isinstance(material_data, dict):
-                        material = Material.from_dict(material_data)
-                    elif material_data and isinstance(material_data, Material):
-                        material = material_data
-                    else:
-                        material = Material(name="UnknownMaterial") # Fallback
-
-                    # Determine ingredient type
-                    if ingr_data.get('amount') is None and ingr_data.get('unit') is None:
-                        ingredients.append(UnspecifiedAmountIngredient(material=material, name=ingr_data.get('name'), **ingr_data.get('contents',{})))
-                    elif ingr_data.get('amount') == 100.0 and ingr_data.get('unit') == "percent":
-                        ingredients.append(WholeIngredient(material=material, name=ingr_data.get('name'), **ingr_data.get('contents',{})))
-                    else:
-                        ingredients.append(Ingredient(material=material, amount=ingr_data.get('amount'), unit=ingr_data.get('unit'), name=ingr_data.get('name'), **ingr_data.get('contents',{})))
-                elif isinstance(ingr_data, Ingredient):
-                    ingredients.append(ingr_data)
-
-            # Generated materials
-            gen_materials = []
-            for mat_data in data.get('gen_materials', []):
-                if isinstance(mat_data, dict):
-                    gen_materials.append(Material.from_dict(mat_data))
-                elif isinstance(mat_data, Material):
-                    gen_materials.append(mat_data)
-
-
-            return Action(
-                name=data["name"],
-                actor=actor,
-                ingredients=ingredients,
-                gen_materials=gen_materials,
-                tags=data.get("tags", []),
-                log=data.get("log"), # Pass existing log or create new one
-                id=data.get("id"),
-                created_at=data.get("created_at"),
-                updated_at=data.get("updated_at"),
-                **data.get("contents", {})
-            )
-
-        elif event_type == "measurement":
-            material = data.get('material')
-            if isinstance(material, dict):
-                material = Material.from_dict(material)
-            elif not isinstance(material, Material):
-                material = None 
-
-            actor = data.get('actor')
-            if isinstance(actor, dict):
-                actor = Actor(**actor)
-            elif not isinstance(actor, Actor):
-                actor = None 
-
-            return Measurement(
-                name=data["name"],
-                material=material,
-                actor=actor,
-                tags=data.get("tags", []),
-                log=data.get("log"),
-                id=data.get("id"),
-                created_at=data.get("created_at"),
-                updated_at=data.get("updated_at"),
-                **data.get("contents", {})
-            )
-        elif event_type == "analysis":
-            actor = data.get('actor')
-            if isinstance(actor, dict):
-                actor = Actor(**actor)
-            elif not isinstance(actor, Actor):
-                actor = None 
-
-            measurements = []
-            for meas_data in data.get('measurements', []):
-                if isinstance(meas_data, dict):
-                    measurements.append(Measurement.from_dict(meas_data)) # Recursively call from_dict
-                elif isinstance(meas_data, Measurement):
-                    measurements.append(meas_data)
-
-            upstream_analysis = []
-            for an_data in data.get('upstream_analysis', []):
-                if isinstance(an_data, dict):
-                    upstream_analysis.append(Analysis.from_dict(an_data)) # Recursively call from_dict
-                elif isinstance(an_data, Analysis):
-                    upstream_analysis.append(an_data)
-
-            return Analysis(
-                name=data["name"],
-                actor=actor,
-                measurements=measurements,
-                upstream_analysis=upstream_analysis,
-                tags=data.get("tags", []),
-                log=data.get("log"),
-                id=data.get("id"),
-                created_at=data.get("created_at"),
-                updated_at=data.get("updated_at"),
-                **data.get("contents", {})
-            )
-        else:
+        event_cls = BaseEvent._registry.get(event_type or "")
+        if event_cls is None:
             raise ValueError(f"Unknown event type: {event_type}. Must be one of 'action', 'material', 'measurement', or 'analysis'.")
+        memo = _from_dict_memo.get()
+        if memo is None:
+            # Outermost call owns the memo for the whole nested rebuild
+            token = _from_dict_memo.set({})
+            try:
+                return cls.from_dict(data)
+            finally:
+                _from_dict_memo.reset(token)
+        event_id = data.get("id")
+        event = memo.get(event_id) if event_id is not None else None
+        if event is None:
+            event = event_cls._from_dict(data)
+            memo[event.id] = event
+        return event
+
+    @classmethod
+    def bulk_from_dicts(cls, items: List[Dict[str, Any]]) -> List['BaseEvent']:
+        # One memo, one clock read and one id batch for the whole payload; events referenced
+        # from several items are rebuilt once
+        _reserve_ids(sum(1 for data in items if data.get("id") is None))
+        token = _from_dict_memo.set({})
+        try:
+            with cls.shared_timestamp():
+                return [cls.from_dict(data) for data in items]
+        finally:
+            _from_dict_memo.reset(token)
+
+    @classmethod
+    def _from_dict(cls, data: Dict[str, Any]) -> 'BaseEvent':
+        # Each registered event type rebuilds itself from its own to_dict record
+        raise NotImplementedError(f"{cls.__name__} must implement _from_dict()")
+
+    def _init_structure(self) -> None:
+        # Subclasses set their structural fields (actor, ingredients, ...) to empty here
+        pass
+
+    @classmethod
+    def _from_trusted_dict(cls, data: Dict[str, Any]) -> 'BaseEvent':
+        """
+        Rebuild an event from a record its own to_dict produced, e.g. one loaded back from the database.
+        Slots are assigned directly: no validation, logger setup, id stamping or edge coercion.
+        Edges come back as id stubs and structural fields (actor, ingredients, ...) start empty.
+        """
+        event_type = data["event_type"]
+        event_cls = BaseEvent._registry[event_type]
+        event = cast(BaseEvent, object.__new__(event_cls)) # Bare instance; no __init__
+        event.id = data["id"]
+        event._hash = hash(event.id)
+        event._log_seed = None
+        event._log = None
+        event.name = data["name"]
+        tags = data.get("tags")
+        event.tags = [sys.intern(tag) for tag in tags] if tags else _NO_TAGS
+        event.task_id = None
+        event.parameters = _EMPTY_PARAMETERS
+        event.created_at = data["created_at"]
+        event.updated_at = data.get("updated_at")
+        event._history = None
+        # Copied: a shared mapping must not alias the caller's row
+        event._contents = _shared_contents(dict(data.get("contents") or ()))
+        event.type = _TYPES[event_type]
+        event.type_code = _TYPE_CODES[event_type]
+        upstream, downstream = data.get("upstream"), data.get("downstream")
+        event.upstream = [_StubEvent(ref["event_id"], ref["type"]) for ref in upstream] if upstream else _NO_EDGES
+        event.downstream = [_StubEvent(ref["event_id"], ref["type"]) for ref in downstream] if downstream else _NO_EDGES
+        event._init_structure()
+        return event
+
+    def _reduce_fields(self) -> Dict[str, Any]:
+        # Structural fields a subclass needs rebuilt on unpickling, on top of to_dict
+        return {}
+
+    def __reduce__(self):
+        # Pickle the flat record instead of recursing through the upstream/downstream
+        # web; plain neighbours come back as id stubs, structural ones are pickled as objects.
+        # Fields to_dict leaves out ride along as state for __setstate__
+        state = (
+            self.task_id,
+            dict(self.parameters) if self.parameters else None,
+            list(self._history) if self._history else None,
+        )
+        return (BaseEvent.from_dict, ({**self.to_dict(), **self._reduce_fields()},), state)
+
+    def __setstate__(self, state: Tuple[Optional[versionid], Optional[Dict[str, Any]], Optional[List[Any]]]) -> None:
+        self.task_id, parameters, history = state
+        if parameters:
+            self.parameters = parameters
+        if history:
+            self.history.extend(history)
+
+    def _restore_edges(self, data: Dict[str, Any]) -> None:
+        # to_dict records edges as id refs; refs already linked through structural
+        # fields (ingredients, material, measurements, ...) are skipped
+        for neighbour in self.upstream:
+            _adopt(neighbour.downstream, self)
+        for neighbour in self.downstream:
+            _adopt(neighbour.upstream, self)
+        upstream, downstream = data.get("upstream"), data.get("downstream")
+        if upstream:
+            self.add_upstream_many(_unlinked(upstream, self.upstream))
+        if downstream:
+            self.add_downstream_many(_unlinked(downstream, self.downstream))
+
+class Material(BaseEvent, event_type="material"):
+    __slots__ = ()
 
-class Material(BaseEvent):
     def __init__(
             self,
             name: str,
@@ -296,19 +598,28 @@ class Material(BaseEvent):
             updated_at: Optional[int] = None, # Added updated_at
             **contents: Any
         ):
-        self.id = vm()  
-        super().__init__(name, upstream, downstream, tags, event_type="material", log=log,
+        super().__init__(name, upstream, downstream, tags, event_type="material", log=log, id=id,
                          created_at=created_at, updated_at=updated_at, **contents)
 
+    @classmethod
+    def _from_dict(cls, data: Dict[str, Any]) -> 'Material':
+        return cls(
+            upstream=data.get("upstream"),
+            downstream=data.get("downstream"),
+            **_base_kwargs(data),
+        )
+
     def invalid(self):
-        if any(getattr(event, 'type', None) not in ["action"] for event in self.upstream):
+        if _any_not_in(self.upstream, MATERIAL_UP_MASK):
             return True
-        if any(getattr(event, 'type', None) not in ["action", "measurement"] for event in self.downstream):
+        if _any_not_in(self.downstream, MATERIAL_DOWN_MASK):
             return True
         return False
 
 
 class Ingredient():
+    __slots__ = ('name', 'material', 'amount', 'unit', '_contents')
+
     def __init__(
             self,
             material: Material,
@@ -320,7 +631,7 @@ class Ingredient():
         # Inherit material name if ingredient name is not provided
         if name is None:
             name = material.name
-        self.name = name
+        self.name = sys.intern(name)
         self.material = material
         self.amount = amount
         self.unit = unit
@@ -330,79 +641,118 @@ class Ingredient():
         return f"<Ingredient ** {self.name} ** {self.material.name} ** {self.amount} {self.unit if self.unit else 'units'}>"
 
 class UnspecifiedAmountIngredient(Ingredient):
+    __slots__ = ()
+
     def __init__(self, material: Material, name: Optional[str] = None, **contents):
         super().__init__(material=material, amount=None, unit=None, name=name, **contents)
 
 class WholeIngredient(Ingredient):
+    __slots__ = ()
+
     def __init__(self, material: Material, name: Optional[str] = None, **contents):
         super().__init__(material=material, amount=100.0, unit="percent", name=name, **contents)
 
 
-class Action(BaseEvent):
+def _ingredient_from_material(material: Material) -> Ingredient:
+    return UnspecifiedAmountIngredient(material=material)
+
+def _ingredient_as_is(ingredient: Ingredient) -> Ingredient:
+    return ingredient
+
+# Exact-type dispatch for Action.add_ingredient; subclasses fall back to isinstance.
+# The argument's type picks the entry, which a checker cannot follow, so entries take Any
+_ING_DISPATCH: Dict[type, Callable[[Any], Ingredient]] = {
+    Material: _ingredient_from_material,
+    Ingredient: _ingredient_as_is,
+    WholeIngredient: _ingredient_as_is,
+    UnspecifiedAmountIngredient: _ingredient_as_is,
+}
+
+
+class Action(BaseEvent, event_type="action"):
+    __slots__ = ('actor', 'ingredients', 'gen_materials', '_gen_material_ids')
+    actor: Optional[Actor] # None for actions recorded without one, and on the trusted load path
+    ingredients: List[Ingredient]
+    gen_materials: List[Material]
+    _gen_material_ids: Set[versionid]
+
     def __init__(
             self,
             name: str,
-            actor: Actor,
-#           id: Optional[versionid] = None,
+            actor: Optional[Actor],
             ingredients: Optional[List[Union[Ingredient, Dict[str, Any]]]] = None, 
             gen_materials: Optional[List[Union[Material, Dict[str, Any]]]] = None,
             tags: Optional[List[str]] = None,
             log: Optional[Log] = None,
+            id: Optional[versionid] = None,
             created_at: Optional[int] = None,
             updated_at: Optional[int] = None,
             **contents,
         ):
-        self.id = vm()  
-        super().__init__(name, tags=tags, event_type="action", log=log,
+        super().__init__(name, tags=tags, event_type="action", log=log, id=id,
                          created_at=created_at, updated_at=updated_at, **contents)
 
+        self._init_structure()
         self.actor = actor 
-        self.ingredients = []
-        self.gen_materials = []
-        self.log = (log or Log(name)).with_context(
-            action_name=name,
-            action_id=self.id,
-        )
 
         for ingredient in ingredients or []:
             self.add_ingredient(ingredient)
         for material in gen_materials or []:
             self.add_gen_material(material)
 
+    def _init_structure(self) -> None:
+        self.actor = None
+        self.ingredients = []
+        self.gen_materials = []
+        self._gen_material_ids = set() # Membership sidecar for gen_materials
+
+    @classmethod
+    def _from_dict(cls, data: Dict[str, Any]) -> 'Action':
+        action = cls(
+            actor=_actor_from(data.get("actor")),
+            ingredients=[
+                _ingredient_from_dict(ingredient) if isinstance(ingredient, dict) else ingredient
+                for ingredient in data.get("ingredients", [])
+            ],
+            gen_materials=data.get("gen_materials", []), # dicts are rebuilt by add_gen_material
+            **_base_kwargs(data),
+        )
+        action._restore_edges(data)
+        return action
+
+    def _reduce_fields(self) -> Dict[str, Any]:
+        return {"actor": self.actor, "ingredients": self.ingredients, "gen_materials": self.gen_materials}
+
+    def _log_context(self) -> Dict[str, Any]:
+        return {"action_name": self.name, "action_id": self.id}
+
     def add_ingredient(self, ingredient: Union[Ingredient, Material, Dict[str, Any]]) -> None:
-        if isinstance(ingredient, Material):
-            ingredient = UnspecifiedAmountIngredient(material=ingredient)
-            self.add_upstream(ingredient.material) # Correctly add the material upstream
-            ingredient.material.add_downstream(self)
-            self.ingredients.append(ingredient)
-        elif isinstance(ingredient, Ingredient):
-            self.add_upstream(ingredient.material)
-            ingredient.material.add_downstream(self)
-            self.ingredients.append(ingredient)
+        handler = _ING_DISPATCH.get(type(ingredient))
+        if handler is not None:
+            ingredient = handler(ingredient)
+        elif isinstance(ingredient, Material):
+            ingredient = _ingredient_from_material(ingredient)
         elif isinstance(ingredient, dict):
             self.log.error("Please pass Ingredient or Material objects to add_ingredient, not raw dicts.")
             return
-        else:
+        elif not isinstance(ingredient, Ingredient):
             self.log.error("Ingredient must be an Ingredient or Material instance.")
             return
+        _link(ingredient.material, self) # Material feeds this action
+        self.ingredients.append(ingredient)
 
 
     def add_gen_material(self, material: Union[Material, Dict[str, Any]]) -> None:
-        if isinstance(material, dict):
-            material_obj = Material.from_dict(material) 
-            self.add_downstream(material_obj)
-            material_obj.add_upstream(self)
-            # FIXME: Check if material_obj is already in gen_materials
-            self.gen_materials.append(material_obj)
-        elif isinstance(material, Material):
-            if material in self.gen_materials:
-                pass # Already added
-            self.add_downstream(material)
-            material.add_upstream(self)
-            self.gen_materials.append(material)
-        else:
+        # A dict may rebuild into some other event type, so the result is checked too
+        material_obj = Material.from_dict(material) if isinstance(material, dict) else material
+        if not isinstance(material_obj, Material):
             self.log.error("Generated material must be a Material instance or a dict representation.")
             return
+        if material_obj.id in self._gen_material_ids:
+            return # Already added
+        _link(self, material_obj)
+        self.gen_materials.append(material_obj)
+        self._gen_material_ids.add(material_obj.id)
 
 
     def generate_generic_material(self, name: Optional[str] = None) -> Material:
@@ -411,32 +761,41 @@ class Action(BaseEvent):
             #FIXME: Should return None 
             return self.gen_materials[0]  
 
+        # One stamp serves as the material's id and as the suffix of its generated name
+        raw_id = _new_id()
         generated_name = name
         if generated_name is None:
             if len(self.ingredients) > 0:
-                generated_name = f"{self.name}"
-                for ingredient in self.ingredients:
-                    generated_name += f"+{ingredient.name}"
-                generated_name += f"_{vm()[-4:]}"
+                # Name at most _NAMED_INGREDIENTS ingredients so the name length stays bounded;
+                # the rest are folded into a short digest
+                parts = [ingredient.name for ingredient in self.ingredients[:_NAMED_INGREDIENTS]]
+                rest = self.ingredients[_NAMED_INGREDIENTS:]
+                if rest:
+                    parts.append(blake2b("|".join(ingredient.name for ingredient in rest).encode(), digest_size=3).hexdigest())
+                generated_name = f"{self.name}+{'+'.join(parts)}_{raw_id[-4:]}"
             else:
-                generated_name = f"{self.name}_NI{vm()[-4:]}"
+                generated_name = f"{self.name}_NI{raw_id[-4:]}"
 
-        generic = Material(name=generated_name)
-        generic.add_upstream(self) 
-        self.add_downstream(generic)
+        generic = Material(name=generated_name, id=raw_id)
+        _link(self, generic)
         self.gen_materials = [generic]
+        self._gen_material_ids = {generic.id}
         return generic
 
     def invalid(self) -> bool:
-        if any(getattr(event, 'type', None) not in ["material"] for event in self.upstream):
+        if _any_not_in(self.upstream, ACTION_UP_MASK):
             return True
-        if any(getattr(event, 'type', None) not in ["material", "measurement"] for event in self.downstream):
+        if _any_not_in(self.downstream, ACTION_DOWN_MASK):
             return True
         if len(self.gen_materials) == 0 and len(self.ingredients) == 0:
             return True
         return False
 
-class Measurement(BaseEvent):
+class Measurement(BaseEvent, event_type="measurement"):
+    __slots__ = ('_material', '_actor')
+    _material: Optional[Material]
+    _actor: Optional[Actor]
+
     def __init__(
             self,
             name: str,
@@ -444,20 +803,15 @@ class Measurement(BaseEvent):
             actor: Optional[Actor] = None, 
             tags: Optional[List[str]] = None,
             log: Optional[Log] = None,
+            id: Optional[versionid] = None,
             created_at: Optional[int] = None,
             updated_at: Optional[int] = None,
             **contents: Any,
             ):
-        self.id = vm()
         super(Measurement, self).__init__(
-                name=name, tags=tags, event_type="measurement", log=log, created_at=created_at, updated_at=updated_at, **contents
-        )
-        self._material = None
-        self._actor = None
-        self.log = (log or Log(name)).with_context(
-            measurement_name=name,
-            measurement_id=self.id,
+                name=name, tags=tags, event_type="measurement", log=log, id=id, created_at=created_at, updated_at=updated_at, **contents
         )
+        self._init_structure()
         # _contents is handled by super().__init__ now
 
         if material:
@@ -465,16 +819,41 @@ class Measurement(BaseEvent):
         if actor:
             self.actor = actor 
 
+    def _init_structure(self) -> None:
+        self._material = None
+        self._actor = None
+
     def invalid(self) -> bool:
         """
         A measurement event is invalid if its upstream contains anything but a material, or if its downstream contains anything but an analysis event.
         """
-        if any(getattr(event, 'type', None) not in ["material"] for event in self.upstream):
+        if _any_not_in(self.upstream, MEASUREMENT_UP_MASK):
             return True
-        if any(getattr(event, 'type', None) not in ["analysis"] for event in self.downstream):
+        if _any_not_in(self.downstream, MEASUREMENT_DOWN_MASK):
             return True
         return False
 
+    @classmethod
+    def _from_dict(cls, data: Dict[str, Any]) -> 'Measurement':
+        material = data.get("material")
+        if isinstance(material, dict):
+            material = Material.from_dict(material)
+        elif not isinstance(material, Material):
+            material = None
+        measurement = cls(
+            material=material,
+            actor=_actor_from(data.get("actor")),
+            **_base_kwargs(data),
+        )
+        measurement._restore_edges(data)
+        return measurement
+
+    def _reduce_fields(self) -> Dict[str, Any]:
+        return {"material": self._material, "actor": self._actor}
+
+    def _log_context(self) -> Dict[str, Any]:
+        return {"measurement_name": self.name, "measurement_id": self.id}
+
     @property
     def material(self) -> Optional[Material]:
         return self._material
@@ -488,8 +867,7 @@ class Measurement(BaseEvent):
             self.log.error("Material is already set for this measurement.")
             return
         self._material = material_obj
-        self.add_upstream(material_obj) # Add as upstream BaseEvent
-        material_obj.add_downstream(self) # Link the material back
+        _link(material_obj, self)
 
     @property
     def actor(self) -> Optional[Actor]:
@@ -502,7 +880,14 @@ class Measurement(BaseEvent):
             return
         self._actor = actor_obj
 
-class Analysis(BaseEvent):
+class Analysis(BaseEvent, event_type="analysis"):
+    __slots__ = ('_measurements', '_upstream_analysis', '_actor', '_measurement_ids', '_upstream_analysis_ids')
+    _measurements: List['Measurement']
+    _upstream_analysis: List['Analysis']
+    _actor: Optional[Actor]
+    _measurement_ids: Set[versionid]
+    _upstream_analysis_ids: Set[versionid]
+
     def __init__(
             self,
             name: str,
@@ -511,19 +896,17 @@ class Analysis(BaseEvent):
             upstream_analysis: Optional[List[Union['Analysis', Dict[str, Any]]]] = None,
             tags: Optional[List[str]] = None,
             log: Optional[Log] = None,
+            id: Optional[versionid] = None,
             created_at: Optional[int] = None,
             updated_at: Optional[int] = None,
             **contents: Any,
             ):
-        self.id = vm()
         super(Analysis, self).__init__(
-                name=name, tags=tags, event_type="analysis", log=log,
+                name=name, tags=tags, event_type="analysis", log=log, id=id,
                 created_at=created_at, updated_at=updated_at, **contents
                 )
 
-        self._measurements = []
-        self._upstream_analysis = []
-        self._actor = None
+        self._init_structure()
         # _contents handled by super
 
         if actor:
@@ -533,6 +916,28 @@ class Analysis(BaseEvent):
         for analysis in upstream_analysis or []:
             self.add_upstream_analysis(analysis)
 
+    def _init_structure(self) -> None:
+        self._measurements = []
+        self._upstream_analysis = []
+        # Membership sidecars for the two lists above
+        self._measurement_ids = set()
+        self._upstream_analysis_ids = set()
+        self._actor = None
+
+    @classmethod
+    def _from_dict(cls, data: Dict[str, Any]) -> 'Analysis':
+        # Nested measurement/analysis dicts are rebuilt by add_measurement/add_upstream_analysis
+        analysis = cls(
+            actor=_actor_from(data.get("actor")),
+            measurements=data.get("measurements", []),
+            upstream_analysis=data.get("upstream_analysis", []),
+            **_base_kwargs(data),
+        )
+        analysis._restore_edges(data)
+        return analysis
+
+    def _reduce_fields(self) -> Dict[str, Any]:
+        return {"actor": self._actor, "measurements": self._measurements, "upstream_analysis": self._upstream_analysis}
 
     @property
     def actor(self) -> Optional[Actor]:
@@ -546,33 +951,29 @@ class Analysis(BaseEvent):
         self._actor = actor_obj
 
     def add_measurement(self, measurement: Union[Measurement, Dict[str, Any]]) -> None:
-        if isinstance(measurement, dict):
-            measurement_obj = Measurement.from_dict(measurement)
-        elif isinstance(measurement, Measurement):
-            measurement_obj = measurement
-        else:
+        # A dict may rebuild into some other event type, so the result is checked too
+        measurement_obj = Measurement.from_dict(measurement) if isinstance(measurement, dict) else measurement
+        if not isinstance(measurement_obj, Measurement):
             self.log.error("Measurement must be a Measurement instance or a dict representation.")
             return
-        if measurement_obj in self._measurements:
+        if measurement_obj.id in self._measurement_ids:
             return
-        measurement_obj.add_downstream(self)
-        self.add_upstream(measurement_obj)
+        _link(measurement_obj, self)
         self._measurements.append(measurement_obj)
+        self._measurement_ids.add(measurement_obj.id)
 
     def add_upstream_analysis(self, analysis: Union['Analysis', Dict[str, Any]]) -> None:
-        if isinstance(analysis, dict):
-            analysis_obj = Analysis.from_dict(analysis)
-        elif isinstance(analysis, Analysis):
-            analysis_obj = analysis
-        else:
+        # A dict may rebuild into some other event type, so the result is checked too
+        analysis_obj = Analysis.from_dict(analysis) if isinstance(analysis, dict) else analysis
+        if not isinstance(analysis_obj, Analysis):
             self.log.error("Upstream analysis must be an Analysis instance or a dict representation.")
             return
 
-        if analysis_obj in self._upstream_analysis:
+        if analysis_obj.id in self._upstream_analysis_ids:
             return
-        analysis_obj.add_downstream(self)
-        self.add_upstream(analysis_obj)
+        _link(analysis_obj, self)
         self._upstream_analysis.append(analysis_obj)
+        self._upstream_analysis_ids.add(analysis_obj.id)
 
     def invalid(self) -> bool:
         """
@@ -582,8 +983,50 @@ class Analysis(BaseEvent):
             return True
         if self._actor is None:
             return True
-        if any(getattr(event, 'type', None) not in ["measurement", "analysis"] for event in self.upstream):
+        if _any_not_in(self.upstream, ANALYSIS_UP_MASK):
             return True
-        if any(getattr(event, 'type', None) not in ["analysis"] for event in self.downstream):
+        if _any_not_in(self.downstream, ANALYSIS_DOWN_MASK):
             return True
         return False
+
+
+def _base_kwargs(data: Dict[str, Any]) -> Dict[str, Any]:
+    # Constructor kwargs shared by every event type, read from the record once; contents
+    # are merged in so each factory splats a single mapping
+    get = data.get
+    return {
+        **(get("contents") or _EMPTY_CONTENTS),
+        "name": data["name"],
+        "tags": get("tags"),
+        "log": get("log"),
+        "id": get("id"),
+        "created_at": get("created_at"),
+        "updated_at": get("updated_at"),
+    }
+
+def _actor_from(value: Any) -> Optional[Actor]:
+    if isinstance(value, Actor):
+        return value
+    if isinstance(value, dict):
+        return Actor(**value)
+    return None
+
+def _ingredient_from_dict(data: Dict[str, Any]) -> Ingredient:
+    material = data.get("material")
+    if isinstance(material, dict):
+        material = Material.from_dict(material)
+    elif not isinstance(material, Material):
+        material = Material(name="UnknownMaterial") # Fallback
+    amount, unit = data.get("amount"), data.get("unit")
+    shape = (amount is None and unit is None, amount == 100.0 and unit == "percent")
+    return _ING_CTORS.get(shape, _ingredient_with_amount)(material, amount, unit, data.get("name"), data.get("contents", {}))
+
+def _ingredient_with_amount(material, amount, unit, name, contents) -> Ingredient:
+    return Ingredient(material=material, amount=amount, unit=unit, name=name, **contents)
+
+# (unspecified amount, whole) -> constructor; anything else is a plain Ingredient.
+# Materials are shared through the from_dict memo, so each is rebuilt once per payload.
+_ING_CTORS = {
+    (True, False): lambda material, amount, unit, name, contents: UnspecifiedAmountIngredient(material=material, name=name, **contents),
+    (False, True): lambda material, amount, unit, name, contents: WholeIngredient(material=material, name=name, **contents),
+}
@@ -1,19 +1,29 @@
 from src.task import Task
 from time import time_ns
-from src.event import Material, Action, Measurement, Analysis
-from typing import List, Optional, Dict, Any, Literal, Union, TYPE_CHECKING
+from src.event import BaseEvent, Material, Action, Measurement, Analysis, _TYPE_CODES
+from typing import List, Optional, Dict, Any, Literal, Union, Tuple, Iterator, TYPE_CHECKING
 from src.lab import Lab, Project
 from abc import ABC
 from enum import Enum
+from array import array
+from itertools import compress, repeat
+from operator import eq, ge, le
 from util.versionstamp import versionid, versionstamp
-from util.log import Log
+from util.log import Log, get_log
 from util.status import Status
+from util.serialize import json_default
 vm = versionstamp()
 
 if TYPE_CHECKING:
     from src.sample import Sample 
 
 class Experiment:
+    __slots__ = (
+        'id', 'name', 'log', '_contents', 'description', 'created_at', 'updated_at', 'status', 'tags',
+        'samples', 'tasks', 'lab', 'project', '_sample_name_prefix',
+        '_event_registry', '_index_ids', '_index_types', '_index_created_at',
+    )
+
     def __init__(
         self,
         name: str,
@@ -22,34 +32,45 @@ class Experiment:
         project: Project,
         status: Status = Status.PENDING,
         description: Optional[str] = None,
-        tags: List[str] = [],
-        samples: List['Sample'] = [],
-        tasks: List[Task] = [],
+        tags: Optional[List[str]] = None,
+        samples: Optional[List['Sample']] = None,
+        tasks: Optional[List[Task]] = None,
         **contents: Any
         ):
 
-        self.id = vm()
+        now = time_ns() // 1_000 # One clock read for the id, created_at and the first save
+        self.id = vm(now)
         self.name = name
-        self.log = (log or Log(name)).with_context(
+        self.log = (log or get_log(name)).with_context(
             experiment_name=name,
             experiment_id=self.id,
-            samples=[sample.id for sample in samples] if samples else [],
-            tasks=[task.id for task in tasks] if tasks else []
+            # Tuples: a fixed snapshot held for the Log's lifetime, smaller than lists and
+            # passed straight through to the record attributes
+            samples=tuple(sample.id for sample in samples) if samples else (),
+            tasks=tuple(task.id for task in tasks) if tasks else ()
         )
         self._contents = contents
         self.description = description or ""
-        self.created_at = time_ns() // 1_000
+        self.created_at = now
         self.updated_at = None
         self.status = status
-        self.tags = tags or []
-        self.samples = samples or []
-        self.tasks = tasks or []
+        self.tags = [] if tags is None else tags
+        self.samples = [] if samples is None else samples
+        self.tasks = [] if tasks is None else tasks
         self.lab = lab
         self.project = project
-        self.save()
+        # Lab/experiment/project part of generated sample names; fixed for the experiment's lifetime
+        self._sample_name_prefix = f"{lab.code[:3].upper()}{self.id[:3].upper()}.{project.id[:3].upper()}:"
+        # Every event of every sample, by id; resolves id-only edges back to live events
+        self._event_registry: Dict[versionid, BaseEvent] = {}
+        # Column view of the registry in registration order, for whole-experiment queries
+        self._index_ids: List[versionid] = []
+        self._index_types = array('b')
+        self._index_created_at = array('q')
+        self.save(now)
 
-    def save(self):
-        self.updated_at = time_ns() // 1_000
+    def save(self, now: Optional[int] = None):
+        self.updated_at = time_ns() // 1_000 if now is None else now
         self.log.info(f"Experiment {self.name} saved with status {self.status.value}")
         # TODO: Implement once DB connection is created
 
@@ -70,10 +91,83 @@ class Experiment:
             data["tasks"] = [task.to_dict() for task in self.tasks]
         return data
 
+    def register_event(self, event: BaseEvent) -> None:
+        if event.id not in self._event_registry:
+            self._index_ids.append(event.id)
+            self._index_types.append(event.type_code)
+            self._index_created_at.append(event.created_at)
+        self._event_registry[event.id] = event
+
+    def events_of_type(self, event_type: Literal['action', 'material', 'measurement', 'analysis']) -> List[BaseEvent]:
+        code = _TYPE_CODES[event_type]
+        ids = compress(self._index_ids, map(eq, self._index_types, repeat(code)))
+        return [self._event_registry[event_id] for event_id in ids]
+
+    def events_created_between(self, start: int, end: int) -> List[BaseEvent]:
+        # Both bounds inclusive, in microseconds like created_at
+        created_at = self._index_created_at
+        in_range = map(bool.__and__, map(ge, created_at, repeat(start)), map(le, created_at, repeat(end)))
+        return [self._event_registry[event_id] for event_id in compress(self._index_ids, in_range)]
+
+    def get_event(self, event_id: versionid) -> Optional[BaseEvent]:
+        return self._event_registry.get(event_id)
+
+    def load_events_trusted(self, rows: List[Dict[str, Any]]) -> List[BaseEvent]:
+        # Bulk path for known-good to_dict records, e.g. from the database. Events are
+        # registered, and edge stubs pointing at registered events are swapped for them.
+        events = [BaseEvent._from_trusted_dict(row) for row in rows]
+        for event in events:
+            self.register_event(event)
+        registry = self._event_registry
+        for event in events:
+            if event.upstream:
+                event.upstream = [registry.get(edge.id, edge) for edge in event.upstream]
+            if event.downstream:
+                event.downstream = [registry.get(edge.id, edge) for edge in event.downstream]
+        return events
+
+    def to_flat_rows(self) -> Tuple[List[Dict[str, Any]], List[Tuple[versionid, versionid]]]:
+        # One row per event across all samples plus a deduplicated (parent id, child id) edge list,
+        # so nothing recurses through the event graph
+        events = self._event_registry.values()
+        rows = [event.to_row() for event in events]
+        edges: Dict[Tuple[versionid, versionid], None] = {} # Insertion-ordered set
+        for event in events:
+            for parent in event.upstream:
+                edges[(parent.id, event.id)] = None
+            for child in event.downstream:
+                edges[(event.id, child.id)] = None
+        return rows, list(edges)
+
+    def to_json(self, flat: bool = False) -> bytes:
+        # orjson walks the dicts in C; flat=True emits to_flat_rows() instead of the nested tree
+        import orjson
+        if flat:
+            rows, edges = self.to_flat_rows()
+            data = {"id": self.id, "name": self.name, "events": rows, "edges": edges}
+        else:
+            data = self.to_dict(include_tasks=False) # Task has no to_dict yet
+        return orjson.dumps(data, default=json_default)
+
+    def iter_json(self) -> Iterator[bytes]:
+        # Same document as to_json(), emitted one event at a time so the whole
+        # to_dict tree is never held in memory; suited to writing straight to a file
+        import orjson
+        yield orjson.dumps(self.to_dict(include_samples=False, include_tasks=False), default=json_default)[:-1] + b',"samples":['
+        for i, sample in enumerate(self.samples):
+            if i:
+                yield b","
+            yield from sample.iter_json()
+        yield b"]}"
+
+    def resolve(self, edge: Any) -> Any:
+        # Swap an id-only edge stub for the registered event; unknown stubs are returned as is
+        return self._event_registry.get(edge.id, edge)
+
     def __repr__(self):
         return f"Experiment(name={self.name}, id={self.id}, created_at={self.created_at})"
 
-    def create_sample(self, description: str = "", tags: List[str] = [], **contents: Any) -> 'Sample':
+    def create_sample(self, description: str = "", tags: Optional[List[str]] = None, **contents: Any) -> 'Sample':
         from src.sample import Sample
         sample = Sample(description=description, tags=tags, log=self.log, experiment=self, **contents)
         self.samples.append(sample)
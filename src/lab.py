@@ -13,12 +13,17 @@ class Lab:
     location: str = Field(..., description="Location of the lab")
     projects: List['Project'] = Field(default_factory=list, description="List of projects in the lab")
     """
+    __slots__ = ('name', 'code', 'location', 'projects', '_project_ids_by_name', 'log', 'id')
 
     def __init__(self, name: str, code: str, location: str, projects: Optional[List['Project']] = None):
         self.name = name
         self.code = code
         self.location = location
         self.projects = projects or []
+        # Name -> id for get_project_id; the first project with a name wins, as a scan would
+        self._project_ids_by_name: Dict[str, versionid] = {}
+        for project in self.projects:
+            self._project_ids_by_name.setdefault(project.name, project.id)
         self.log = Log(name).with_context(
             lab_name=name,
             lab_code=code,
@@ -34,13 +39,11 @@ class Lab:
             lab_id=self.id
             )
         self.projects.append(new_project)
+        self._project_ids_by_name.setdefault(project_name, new_project.id)
         return new_project
 
     def get_project_id(self, project_name: str) -> Optional[versionid]:
-        for project in self.projects:
-            if project.name == project_name:
-                return project.id
-        return None
+        return self._project_ids_by_name.get(project_name)
 
 
 class Project:
@@ -51,6 +54,7 @@ class Project:
     tags: List[str] = Field(default_factory=list, description="Tags for categorization")
     lab_id: versionid = Field(..., description="ID of the lab this project belongs to")
     """
+    __slots__ = ('name', 'description', 'tags', 'lab_id', 'id', 'log')
 
     def __init__(self, name: str, lab_id:versionid,  description: Optional[str] = None, tags: Optional[List[str]] = None):
         self.name = name
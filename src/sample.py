@@ -1,72 +1,108 @@
 from util.versionstamp import versionid, versionstamp
 from time import time_ns
-from util.log import Log
+from random import getrandbits
+from util.log import Log, get_log
 from src.event import BaseEvent, Material, Action, Measurement, Analysis, WholeIngredient
-from typing import List, Optional, Dict, Any
-from src.experiment import Experiment
+from src.store import EventStore
+from typing import List, Optional, Dict, Any, Set, Tuple, Iterator, TYPE_CHECKING
+from collections import defaultdict, deque
+from itertools import chain
 from util.status import Status
-import networkx as nx
+from util.serialize import json_default
+
+if TYPE_CHECKING:
+    import networkx as nx
+    from src.experiment import Experiment
 
 
 vm = versionstamp()
 allowed_events = Material | Action | Measurement | Analysis
+# isinstance against a plain tuple takes the C fast path; the union stays for annotations
+_ALLOWED_EVENTS = (Material, Action, Measurement, Analysis)
+_ALLOWED_EVENT_NAMES = " | ".join(event_cls.__name__ for event_cls in _ALLOWED_EVENTS)
+# (nodes: id -> (type, name), parent -> children, child -> parents), as built by Sample._adjacency
+_Adjacency = Tuple[Dict[versionid, Tuple[str, str]], Dict[versionid, Set[versionid]], Dict[versionid, Set[versionid]]]
+# plot_graph: different color for each type of node
+_NODE_COLORS = {
+    'material': 'lightgreen',
+    'action': 'lightcoral',
+    'measurement': 'lightblue',
+    'analysis': 'lightyellow'
+}
+
 
 class Sample:
+    __slots__ = (
+        'description', 'tags', '_contents', 'created_at', 'updated_at', 'id', 'experiment', 'events',
+        '_event_ids', 'status', 'name', 'log', '_adjacency_cache', '_store_cache', '_graph_cache',
+    )
+    # Derived views, each cached with the _graph_signature() it was built for
+    _adjacency_cache: Optional[Tuple[Tuple[int, int], _Adjacency]]
+    _store_cache: Optional[Tuple[Tuple[int, int], EventStore]]
+    _graph_cache: Optional[Tuple[Tuple[int, int], 'nx.DiGraph']]
+
     def __init__(
         self,
-        experiment: Experiment,
+        experiment: 'Experiment',
         name: Optional[str] = None,
         description: str = "",
-        events: List[allowed_events] = [],
+        events: Optional[List[allowed_events]] = None,
         status: Status = Status.PENDING,
-        tags: List[str] = [],
+        tags: Optional[List[str]] = None,
         log: Optional[Log] = None,
         **contents: Any
     ):
         self.description = description
-        self.tags = tags
+        self.tags = [] if tags is None else tags
         self._contents = contents
         self.created_at = time_ns() // 1_000
         self.updated_at = None
-        self.id = vm()
+        self.id = vm(self.created_at) # Reuses the clock read above
         self.experiment = experiment
         self.events = []
+        self._event_ids: Set[versionid] = set() # Mirrors self.events for O(1) duplicate checks
         self.status = status
+        self._adjacency_cache = None
+        self._store_cache = None
+        self._graph_cache = None
 
         if events is not None:
             for event in events:
                 self.add_event(event)
 
         self.name = self.generate_sample_name(name)
-        self.log = (log or Log(self.name)).with_context(
+        self.log = (log or get_log(self.name)).with_context(
             sample_name = self.name,
             sample_id = self.id,
-            events = [event.id for event in self.events] if self.events else []
+            events = tuple(event.id for event in self.events) if self.events else () # Fixed snapshot, see Experiment
         )
 
     def generate_sample_name(self, name: Optional[str]) -> str:
         if name:
             return name
         # Format: 3 digits Lab code 3 digits experiment code . 3 digit project code : 6 digits timestamp + 2 random
-        # FIXME: Perf improvements here
-        lab_code = self.experiment.lab.code[:3].upper()
-        exp_code = self.experiment.id[:3].upper()
-        project_code = self.experiment.project.id[:3].upper()
+        # The prefix is computed once per experiment; the 2 random hex digits are what the
+        # tail of a fresh version stamp would give, without generating one
         timestamp = str(time_ns() // 1_000_000)[-6:]  # Last 6 digits of the timestamp
-        random_suffix = str(vm())[-2:]
-        name = f"{lab_code}{exp_code}.{project_code}:{timestamp}{random_suffix}"
+        name = f"{self.experiment._sample_name_prefix}{timestamp}{getrandbits(8):02x}"
         return name
 
 
 
 
     def add_event(self, event: allowed_events):
-        if not isinstance(event, allowed_events):
-            self.log.error(f"Event must be of type {allowed_events.__name__}, got {type(event).__name__}")
-            raise TypeError(f"Event must be of type {allowed_events.__name__}")
-        if event in self.events:
+        if not isinstance(event, _ALLOWED_EVENTS):
+            self.log.error(f"Event must be of type {_ALLOWED_EVENT_NAMES}, got {type(event).__name__}")
+            raise TypeError(f"Event must be of type {_ALLOWED_EVENT_NAMES}")
+        if event.id in self._event_ids:
             return
+        self._event_ids.add(event.id)
         self.events.append(event)
+        if self.experiment is not None:
+            self.experiment.register_event(event)
+        self._adjacency_cache = None
+        self._store_cache = None
+        self._graph_cache = None
         self.updated_at = time_ns() // 1_000
 
     def to_dict(self, include_events: bool = True) -> Dict[str, Any]:
@@ -82,6 +118,16 @@ class Sample:
         if include_events:
             data["events"] = [event.to_dict() for event in self.events]
         return data
+
+    def iter_json(self) -> Iterator[bytes]:
+        # orjson.dumps(self.to_dict()) in pieces: the header, then each event on its own
+        import orjson
+        yield orjson.dumps(self.to_dict(include_events=False), default=json_default)[:-1] + b',"events":['
+        for i, event in enumerate(self.events):
+            if i:
+                yield b","
+            yield orjson.dumps(event.to_dict(), default=json_default)
+        yield b"]}"
     # TODO: from_dict method
 
     def __repr__(self):
@@ -93,27 +139,99 @@ class Sample:
         return None
 
     def graph(self):
-        graph = nx.DiGraph()
+        # Callers share the cached graph until the sample or its edges change, so treat it as read-only
+        signature = self._graph_signature()
+        if self._graph_cache is not None and self._graph_cache[0] == signature:
+            return self._graph_cache[1]
+
+        import networkx as nx
+        # Collect everything first and hand it to networkx in two bulk calls. Events win
+        # over outside placeholders for their own node, and a repeated edge keeps the
+        # type of its last sighting, as add_node/add_edge would.
+        nodes: Dict[versionid, Dict[str, str]] = {event.id: {'type': event.type, 'name': event.name} for event in self.events}
+        edges: Dict[Tuple[versionid, versionid], str] = {}
         for event in self.events:
-            event: BaseEvent # This type hint is correct, event is a BaseEvent
-            graph.add_node(event.id, type=event.type, name=event.name)
-            for upstream_event in event.upstream: # Renamed `upstream` to `upstream_event` for clarity
-                # Access attributes directly, not as dictionary keys
-                if upstream_event.id not in graph.nodes:
-                    graph.add_node(upstream_event.id, type=upstream_event.type, name=f"outside_event")
-                graph.add_edge(upstream_event.id, event.id, type=upstream_event.type)
-
-            for downstream_event in event.downstream: # Renamed `downstream` to `downstream_event` for clarity
-                # Access attributes directly, not as dictionary keys
-                if downstream_event.id not in graph.nodes:
-                    graph.add_node(downstream_event.id, type=downstream_event.type, name=f"outside_event")
-                graph.add_edge(event.id, downstream_event.id, type=downstream_event.type)
+            for upstream_event in event.upstream:
+                nodes.setdefault(upstream_event.id, {'type': upstream_event.type, 'name': "outside_event"})
+                edges[(upstream_event.id, event.id)] = upstream_event.type
+            for downstream_event in event.downstream:
+                nodes.setdefault(downstream_event.id, {'type': downstream_event.type, 'name': "outside_event"})
+                edges[(event.id, downstream_event.id)] = downstream_event.type
+        graph = nx.DiGraph()
+        graph.add_nodes_from(nodes.items())
+        graph.add_edges_from((parent, child, {'type': edge_type}) for (parent, child), edge_type in edges.items())
+        self._graph_cache = (signature, graph)
         return graph
 
+    def _graph_signature(self) -> Tuple[int, int]:
+        # Changes whenever an event is added to the sample or any of its events gains an edge
+        return (len(self.events), sum(len(event.upstream) + len(event.downstream) for event in self.events))
+
+    def event_store(self) -> EventStore:
+        signature = self._graph_signature()
+        if self._store_cache is not None and self._store_cache[0] == signature:
+            return self._store_cache[1]
+        store = EventStore.from_events(self.events)
+        self._store_cache = (signature, store)
+        return store
+
+    def _adjacency(self) -> _Adjacency:
+        signature = self._graph_signature()
+        if self._adjacency_cache is not None and self._adjacency_cache[0] == signature:
+            return self._adjacency_cache[1]
+
+        # Forward and reverse links are built in a single pass; each edge is stored on
+        # both of its endpoints so the sets dedup it.
+        nodes: Dict[versionid, Tuple[str, str]] = {event.id: (event.type, event.name) for event in self.events}
+        links: Dict[versionid, Set[versionid]] = defaultdict(set)
+        reverse_links: Dict[versionid, Set[versionid]] = defaultdict(set)
+        for event in self.events:
+            for upstream_event in event.upstream:
+                nodes.setdefault(upstream_event.id, (upstream_event.type, "outside_event"))
+                links[upstream_event.id].add(event.id)
+                reverse_links[event.id].add(upstream_event.id)
+            for downstream_event in event.downstream:
+                nodes.setdefault(downstream_event.id, (downstream_event.type, "outside_event"))
+                links[event.id].add(downstream_event.id)
+                reverse_links[downstream_event.id].add(event.id)
+
+        adjacency = (nodes, dict(links), dict(reverse_links))
+        self._adjacency_cache = (signature, adjacency)
+        return adjacency
+
     def valid_graph(self) -> bool:
-        is_acyclic = nx.is_directed_acyclic_graph(self.graph())
-        connected = len(list(nx.connected_components(self.graph().to_undirected()))) == 1
-        return is_acyclic and connected
+        if not self.event_store().valid_types():
+            return False
+
+        nodes, links, reverse_links = self._adjacency()
+        if not nodes:
+            return False
+
+        # Kahn's algorithm: the graph is acyclic iff every node drains at in-degree zero
+        in_degree = {node: len(reverse_links.get(node, ())) for node in nodes}
+        queue = deque(node for node, degree in in_degree.items() if degree == 0)
+        drained = 0
+        while queue:
+            node = queue.popleft()
+            drained += 1
+            for child in links.get(node, ()):
+                in_degree[child] -= 1
+                if in_degree[child] == 0:
+                    queue.append(child)
+        if drained != len(nodes):
+            return False
+
+        # Weakly connected: one undirected sweep has to reach every node
+        start = next(iter(nodes))
+        seen = {start}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for neighbour in chain(links.get(node, ()), reverse_links.get(node, ())):
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    stack.append(neighbour)
+        return len(seen) == len(nodes)
 
 
     def add_linear_sample_process(self, actions: List[Action]):
@@ -124,10 +242,8 @@ class Sample:
         for a_0, a_1 in zip(actions, actions[1:]):
             if len(a_1.ingredients) == 0:
                 continue
-            if not any([
-                ingredient.material in a_0.gen_materials
-                for ingredient in a_1.ingredients
-                ]):
+            gen_ids = {material.id for material in a_0.gen_materials}
+            if not any(ingredient.material.id in gen_ids for ingredient in a_1.ingredients):
                 self.log.error(f"Action {a_1.name} must use a material generated by the previous action {a_0.name}")
                 raise ValueError(f"Action {a_1.name} must use a material generated by the previous action {a_0.name}")
         for ingredient in actions[0].ingredients:
@@ -151,18 +267,12 @@ class Sample:
 
     def plot_graph(self):
         import matplotlib.pyplot as plt
-        pos = nx.spring_layout(self.graph())
-        # different color for each type of node
-
-        node_colors = {
-            'material': 'lightgreen',
-            'action': 'lightcoral',
-            'measurement': 'lightblue',
-            'analysis': 'lightyellow'
-        }
-        node_color_map = [node_colors[data['type']] for node, data in self.graph().nodes(data=True)]
-        labels = {node: f"{data['name']}\n({data['type']})" for node, data in self.graph().nodes(data=True)}
-        nx.draw(self.graph(), pos, with_labels=True, labels=labels, node_size=1000, node_color=node_color_map, font_size=8, font_color='black', arrows=True)
-        edge_labels = nx.get_edge_attributes(self.graph(), 'type')
-        nx.draw_networkx_edge_labels(self.graph(), pos, edge_labels=edge_labels)
+        import networkx as nx
+        graph = self.graph()
+        pos = nx.spring_layout(graph)
+        node_color_map = [_NODE_COLORS[data['type']] for node, data in graph.nodes(data=True)]
+        labels = {node: f"{data['name']}\n({data['type']})" for node, data in graph.nodes(data=True)}
+        nx.draw(graph, pos, with_labels=True, labels=labels, node_size=1000, node_color=node_color_map, font_size=8, font_color='black', arrows=True)
+        edge_labels = nx.get_edge_attributes(graph, 'type')
+        nx.draw_networkx_edge_labels(graph, pos, edge_labels=edge_labels)
         plt.show()
@@ -0,0 +1,83 @@
+from array import array
+from typing import Dict, List, Sequence
+from util.versionstamp import versionid
+from src.event import BaseEvent, UPSTREAM_MASKS, DOWNSTREAM_MASKS
+
+
+class EventStore:
+    """
+    Column-oriented snapshot of a set of events.
+
+    Each hot field is held in its own flat array, and upstream/downstream
+    edges are stored CSR-style: the neighbours of row i are
+    indices[indptr[i]:indptr[i + 1]]. The events passed in take rows
+    0..n-1; neighbours outside that set are appended after them as
+    type-only rows, so the edge indices stay dense.
+    """
+    __slots__ = (
+        'ids', 'names', 'type_tags', 'created_at', 'size',
+        'up_indptr', 'up_indices', 'up_sources', 'down_indptr', 'down_indices', 'down_sources', '_index',
+    )
+
+    def __init__(self):
+        self.ids: List[versionid] = []
+        self.names: List[str] = []
+        self.type_tags = array('b')
+        self.created_at = array('q')
+        self.size = 0 # Rows that belong to the stored events; the rest are outside neighbours
+        self.up_indptr, self.up_indices = array('i', [0]), array('i')
+        self.down_indptr, self.down_indices = array('i', [0]), array('i')
+        # Row that owns each entry of up_indices/down_indices, i.e. the CSR rows expanded per edge
+        self.up_sources, self.down_sources = array('i'), array('i')
+        self._index: Dict[versionid, int] = {}
+
+    @classmethod
+    def from_events(cls, events: Sequence[BaseEvent]) -> 'EventStore':
+        store = cls()
+        for event in events:
+            store._row(event.id, event.name, event.type_code, event.created_at)
+        store.size = len(store.ids)
+
+        node = store._node
+        up_indptr, up_indices = store.up_indptr, store.up_indices
+        down_indptr, down_indices = store.down_indptr, store.down_indices
+        up_sources, down_sources = store.up_sources, store.down_sources
+        for row, event in enumerate(events):
+            up_indices.extend([node(e) for e in event.upstream])
+            up_indptr.append(len(up_indices))
+            up_sources.extend(array('i', [row]) * len(event.upstream))
+            down_indices.extend([node(e) for e in event.downstream])
+            down_indptr.append(len(down_indices))
+            down_sources.extend(array('i', [row]) * len(event.downstream))
+        return store
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _row(self, id: versionid, name: str, type_tag: int, created_at: int) -> int:
+        row = self._index[id] = len(self.ids)
+        self.ids.append(id)
+        self.names.append(name)
+        self.type_tags.append(type_tag)
+        self.created_at.append(created_at)
+        return row
+
+    def _node(self, neighbour) -> int:
+        row = self._index.get(neighbour.id)
+        if row is None:
+            # Edge stubs carry only id and type, so outside rows get no timestamp
+            row = self._row(neighbour.id, "outside_event", neighbour.type_code, 0)
+        return row
+
+    def row(self, id: versionid) -> int:
+        return self._index[id]
+
+    def valid_types(self) -> bool:
+        # Gather (owner type, neighbour type) for every edge in one C-level pass, then
+        # check the few distinct pairs; EventTypeCode.UNKNOWN is in no mask
+        tag = self.type_tags.__getitem__
+        up_pairs = set(zip(map(tag, self.up_sources), map(tag, self.up_indices)))
+        if not all((1 << neighbour) & UPSTREAM_MASKS[owner] for owner, neighbour in up_pairs):
+            return False
+        down_pairs = set(zip(map(tag, self.down_sources), map(tag, self.down_indices)))
+        return all((1 << neighbour) & DOWNSTREAM_MASKS[owner] for owner, neighbour in down_pairs)
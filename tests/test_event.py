@@ -0,0 +1,81 @@
+import pickle
+import unittest
+
+from src.event import BaseEvent, Material
+
+
+class SharedContentsTest(unittest.TestCase):
+    # Events with equal metadata share one mapping; values that are equal but of a
+    # different type, at any depth, must not be handed another event's copy
+
+    def test_nested_tuple_element_types_are_kept(self):
+        Material(name="a", size=(10, 10))
+        b = Material(name="b", size=(10.0, 10.0))
+        size = b.to_dict()["contents"]["size"]
+        self.assertEqual([type(v) for v in size], [float, float])
+
+    def test_nested_bool_is_not_shared_with_int(self):
+        Material(name="a", flags=(True,))
+        b = Material(name="b", flags=(1,))
+        self.assertIs(type(b.to_dict()["contents"]["flags"][0]), int)
+
+    def test_deeply_nested_and_signed_zero(self):
+        Material(name="a", grid=((0, 1), (2, 3)), offset=0.0)
+        b = Material(name="b", grid=((0.0, 1), (2, 3)), offset=-0.0)
+        contents = b.to_dict()["contents"]
+        self.assertIs(type(contents["grid"][0][0]), float)
+        self.assertEqual(str(contents["offset"]), "-0.0")
+
+    def test_identical_contents_are_shared(self):
+        a = Material(name="a", lot="L-1", size=(10, 10))
+        b = Material(name="b", lot="L-1", size=(10, 10))
+        self.assertIs(a._contents, b._contents)
+
+    def test_unhashable_contents_stay_private(self):
+        a = Material(name="a", readings=[1, 2])
+        b = Material(name="b", readings=[1, 2])
+        self.assertIsNot(a._contents, b._contents)
+        self.assertEqual(b.to_dict()["contents"], {"readings": [1, 2]})
+
+    def test_trusted_load_does_not_alias_the_row(self):
+        row = Material(name="a", lot="L9", tags=["raw"]).to_dict()
+        loaded = BaseEvent._from_trusted_dict(row)
+        row["contents"]["lot"] = "MUTATED"
+        row["tags"].append("MUTATED")
+        self.assertEqual(loaded.to_dict()["contents"], {"lot": "L9"})
+        self.assertEqual(list(loaded.tags), ["raw"])
+        self.assertEqual(Material(name="fresh", lot="L9").to_dict()["contents"], {"lot": "L9"})
+
+
+
+class LoadEdgesTest(unittest.TestCase):
+    # Edges given as a mix of events, id references and event dicts keep their order
+
+    def test_mixed_edges_keep_input_order(self):
+        a = Material(name="a")
+        b = Material(name="b")
+        c = Material(name="c")
+        target = Material(name="target")
+        target.add_upstream_many([a, {"event_id": b.id, "type": b.type}, c])
+        self.assertEqual([e.id for e in target.upstream], [a.id, b.id, c.id])
+
+    def test_all_events_keep_input_order(self):
+        a = Material(name="a")
+        b = Material(name="b")
+        target = Material(name="target")
+        target.add_upstream_many([b, a])
+        self.assertEqual([e.id for e in target.upstream], [b.id, a.id])
+
+
+class PickleTest(unittest.TestCase):
+
+    def test_fields_outside_to_dict_survive_pickling(self):
+        m = Material(name="m", lot="L1")
+        m.task_id = "task-1"
+        m.set_parameter("temp", 5)
+        m.history.append("weighed")
+        loaded = pickle.loads(pickle.dumps(m))
+        self.assertEqual(loaded.id, m.id)
+        self.assertEqual(loaded.task_id, "task-1")
+        self.assertEqual(dict(loaded.parameters), {"temp": 5})
+        self.assertEqual(list(loaded.history), ["weighed"])
@@ -0,0 +1,56 @@
+import logging
+import sys
+import threading
+import unittest
+
+from util.log import Log
+
+
+class _Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class LogTest(unittest.TestCase):
+    log: Log
+    handler: _Collect
+
+    def setUp(self):
+        self.log = Log("tests.log")
+        self.handler = _Collect()
+        self.log.logger.addHandler(self.handler)
+        self.addCleanup(self.log.logger.removeHandler, self.handler)
+
+    def test_records_name_the_calling_line(self):
+        # Both paths report the line that called info(), not the Log wrapper
+        def caller():
+            plain_line = sys._getframe().f_lineno + 1
+            self.log.info("plain")
+            with self.log.batch():
+                held_line = sys._getframe().f_lineno + 1
+                self.log.info("held")
+            return plain_line, held_line
+        plain_line, held_line = caller()
+        plain, held = self.handler.records
+        self.assertEqual((plain.funcName, plain.lineno), ("caller", plain_line))
+        self.assertEqual((held.funcName, held.lineno), ("caller", held_line))
+        self.assertEqual(plain.pathname, __file__)
+        self.assertEqual(held.pathname, __file__)
+
+    def test_batch_holds_records_until_exit(self):
+        with self.log.batch():
+            self.log.info("a")
+            self.log.with_context(step="b").info("b")
+            self.assertEqual(self.handler.records, [])
+        self.assertEqual([r.getMessage() for r in self.handler.records], ["a", "b"])
+
+    def test_batch_does_not_hold_other_threads(self):
+        with self.log.batch():
+            thread = threading.Thread(target=self.log.info, args=("other thread",))
+            thread.start()
+            thread.join()
+            self.assertEqual([r.getMessage() for r in self.handler.records], ["other thread"])
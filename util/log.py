@@ -1,68 +1,213 @@
+import atexit
 import logging
-from typing import Optional, Dict
+import os
+from logging.handlers import QueueHandler, QueueListener
+from queue import Queue
+from typing import Optional, Dict, List, Tuple
 from contextlib import contextmanager
-
-from opentelemetry import trace, _logs
-from opentelemetry.trace import SpanKind
-from opentelemetry.sdk.resources import SERVICE_NAME, Resource
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-
-# For Logs
-from opentelemetry.sdk._logs import LoggerProvider, LoggingHandler
-from opentelemetry.sdk._logs.export import BatchLogRecordProcessor
-from opentelemetry.exporter.otlp.proto.http._log_exporter import OTLPLogExporter
-
-# Resource for both traces and logs
-resources = Resource.create({SERVICE_NAME: "lab_lab"})
-
-trace.set_tracer_provider(TracerProvider(resource=resources))
-tracer = trace.get_tracer("lab_log")
-# SigNoz default OTLP HTTP endpoint for traces
-otlp_trace_exporter = OTLPSpanExporter(endpoint="http://localhost:4318/v1/traces")
-span_processor = BatchSpanProcessor(otlp_trace_exporter)
-trace.get_tracer_provider().add_span_processor(span_processor)
-
-# SigNoz default OTLP HTTP endpoint for logs
-otlp_log_exporter = OTLPLogExporter(endpoint="http://localhost:4318/v1/logs")
-log_processor = BatchLogRecordProcessor(otlp_log_exporter)
-logger_provider = LoggerProvider(resource=resources)
-logger_provider.add_log_record_processor(log_processor)
-_logs.set_logger_provider(logger_provider)
+from contextvars import ContextVar
+from functools import lru_cache
+from time import monotonic
+
+from opentelemetry import trace, context as otel_context
+from opentelemetry.trace import SpanKind, Tracer
+from opentelemetry.sdk._logs import LoggingHandler
+
+# Export to the OTLP collector (SigNoz) only when asked; without a collector every
+# batch would retry against localhost from background exporter threads
+_OTEL_ENABLED = os.getenv("BRAID_OTEL", "0") == "1"
+_NOOP_TRACER = trace.NoOpTracer()
+
+# Log.batch() hands its held records on once this many are waiting, or once the oldest
+# has waited this many seconds (checked as records arrive, and always on exit)
+_BATCH_SIZE = 512
+_BATCH_INTERVAL = 1.0
+
+
+def _span_context() -> otel_context.Context:
+    # Log records only need the active span for trace/span ids; carrying a fresh context
+    # with just that span keeps baggage and other context values from living on in the
+    # export queue with every record
+    return trace.set_span_in_context(trace.get_current_span(), otel_context.Context())
+
+
+class _ContextQueueHandler(QueueHandler):
+    # The OTel handler runs on the listener thread, so carry the caller's context
+    # (active span) across with the record
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        # Records held by Log.batch() already carry the context they were logged under
+        if getattr(record, "otel_context", None) is None:
+            record.otel_context = _span_context()
+        return record
+
+
+class _ContextLoggingHandler(LoggingHandler):
+    def emit(self, record: logging.LogRecord) -> None:
+        ctx = record.__dict__.pop("otel_context", None)
+        token = otel_context.attach(ctx) if ctx is not None else None
+        try:
+            super().emit(record)
+        finally:
+            if token is not None:
+                otel_context.detach(token)
+
+
+@lru_cache(maxsize=1)
+def _init_otel() -> Tuple[QueueHandler, Tracer]:
+    """
+    Set up the OTel trace and log pipelines on first use and return the queue handler
+    Logs attach plus the tracer they use.
+    """
+    from opentelemetry import _logs
+    from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    # For Logs
+    from opentelemetry.sdk._logs import LoggerProvider
+    from opentelemetry.sdk._logs.export import BatchLogRecordProcessor
+    from opentelemetry.exporter.otlp.proto.http._log_exporter import OTLPLogExporter
+
+    # Resource for both traces and logs
+    resources = Resource.create({SERVICE_NAME: "lab_lab"})
+
+    trace.set_tracer_provider(TracerProvider(resource=resources))
+    tracer = trace.get_tracer("lab_log")
+    # SigNoz default OTLP HTTP endpoint for traces
+    otlp_trace_exporter = OTLPSpanExporter(endpoint="http://localhost:4318/v1/traces")
+    span_processor = BatchSpanProcessor(otlp_trace_exporter)
+    trace.get_tracer_provider().add_span_processor(span_processor)
+
+    # SigNoz default OTLP HTTP endpoint for logs
+    otlp_log_exporter = OTLPLogExporter(endpoint="http://localhost:4318/v1/logs")
+    log_processor = BatchLogRecordProcessor(otlp_log_exporter)
+    logger_provider = LoggerProvider(resource=resources)
+    logger_provider.add_log_record_processor(log_processor)
+    _logs.set_logger_provider(logger_provider)
+
+    # Log calls only enqueue; a single background listener hands records to OTel
+    log_queue: Queue = Queue(maxsize=10_000)
+    queue_handler = _ContextQueueHandler(log_queue)
+    queue_listener = QueueListener(
+        log_queue,
+        _ContextLoggingHandler(level=logging.INFO, logger_provider=logger_provider),
+        respect_handler_level=True,
+    )
+    queue_listener.start()
+    atexit.register(queue_listener.stop)
+    return queue_handler, tracer
+
+
+class _Batch:
+    # Records held by an open Log.batch(), each with the logger that handles it
+    __slots__ = ('records', 'started')
+
+    def __init__(self):
+        self.records: List[Tuple[logging.Logger, logging.LogRecord]] = []
+        self.started = monotonic()
+
+    def add(self, logger: logging.Logger, record: logging.LogRecord) -> None:
+        self.records.append((logger, record))
+        if len(self.records) >= _BATCH_SIZE or monotonic() - self.started >= _BATCH_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        records, self.records = self.records, []
+        self.started = monotonic()
+        for logger, record in records:
+            logger.handle(record)
+
+
+# The open batch of the current thread or task; Logs are shared across threads, so
+# the buffer cannot live on the Log itself
+_batch: ContextVar[Optional[_Batch]] = ContextVar("log_batch", default=None)
 
 
 class Log:
     def __init__(self, name: str, context: Optional[Dict[str, str]] = None):
         self.logger = logging.getLogger(name)
         self.logger.setLevel(logging.INFO)
-        #for handler in list(self.logger.handlers):
-        #   self.logger.removeHandler(handler)
-
-        otel_handler = LoggingHandler(level=logging.INFO, logger_provider=logger_provider)
-        self.logger.addHandler(otel_handler)
+        self.tracer = _NOOP_TRACER
+        if _OTEL_ENABLED:
+            queue_handler, self.tracer = _init_otel()
+            # Loggers are shared per name, so attach the queue handler only once
+            if queue_handler not in self.logger.handlers:
+                self.logger.addHandler(queue_handler)
 
-        self.context = context or {}
-        self.tracer = tracer
+        # Owned copy; contexts are never changed after construction, only derived via with_context
+        self.context = dict(context) if context else {}
 
     def with_context(self, **kwargs) -> 'Log':
-        new_context = {**self.context, **kwargs}
-        return Log(self.logger.name, new_context)
+        # The logger is already configured, so the child skips __init__ and shares it
+        child = Log.__new__(Log)
+        child.logger = self.logger
+        child.context = {**self.context, **kwargs}
+        child.tracer = self.tracer
+        return child
 
+    def __reduce__(self):
+        # Loggers and tracers hold locks; a Log is rebuilt from its name and context
+        return (Log, (self.logger.name, self.context))
+
+    def isEnabledFor(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+
+    # Each level checks the logger first so disabled calls skip the context merge
     def info(self, message: str, **kwargs):
-        self.logger.info(message, extra={**self.context, **kwargs})
+        if self.logger.isEnabledFor(logging.INFO):
+            self._emit(logging.INFO, message, kwargs)
 
     def error(self, message: str, **kwargs):
-        self.logger.error(message, extra={**self.context, **kwargs})
+        if self.logger.isEnabledFor(logging.ERROR):
+            self._emit(logging.ERROR, message, kwargs)
 
     def debug(self, message: str, **kwargs):
-        self.logger.debug(message, extra={**self.context, **kwargs})
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self._emit(logging.DEBUG, message, kwargs)
 
     def warning(self, message: str, **kwargs):
-        self.logger.warning(message, extra={**self.context, **kwargs})
+        if self.logger.isEnabledFor(logging.WARNING):
+            self._emit(logging.WARNING, message, kwargs)
 
     def critical(self, message: str, **kwargs):
-        self.logger.critical(message, extra={**self.context, **kwargs})
+        if self.logger.isEnabledFor(logging.CRITICAL):
+            self._emit(logging.CRITICAL, message, kwargs)
+
+    def _emit(self, level: int, message: str, kwargs: Dict) -> None:
+        # makeRecord only copies extra onto the record, so the context itself is passed
+        # when there is nothing to merge
+        extra = {**self.context, **kwargs} if kwargs else self.context
+        batch = _batch.get()
+        if batch is None:
+            # Attribute the record to the code that called info()/error()/..., two frames above _emit
+            self.logger.log(level, message, extra=extra, stacklevel=3)
+            return
+        fn, lno, func, sinfo = self.logger.findCaller(False, 3) # Same frame as the unbatched path
+        record = self.logger.makeRecord(
+            self.logger.name, level, fn, lno, message, (), None, func=func, extra=extra, sinfo=sinfo
+        )
+        # Pin the active span now; the record is handed on later, when the batch flushes
+        record.__dict__["otel_context"] = _span_context()
+        batch.add(self.logger, record)
+
+    @contextmanager
+    def batch(self):
+        """
+        Hold records logged in the current thread or task, through any Log, and hand them
+        to the handlers in batches of up to _BATCH_SIZE or every _BATCH_INTERVAL seconds,
+        and on exit, including when the block raises. Nested blocks join the outermost one.
+        """
+        if _batch.get() is not None:
+            yield self
+            return
+        batch = _Batch()
+        token = _batch.set(batch)
+        try:
+            yield self
+        finally:
+            _batch.reset(token)
+            batch.flush()
 
     @contextmanager
     def trace(self, name: str, **kwargs):
@@ -70,3 +215,10 @@ class Log:
             span.set_attributes(self.context)
             span.set_attributes(kwargs) # Add kwargs to span attributes as well
             yield span
+
+
+@lru_cache(maxsize=512)
+def get_log(name: str) -> Log:
+    # Shared context-free Log per name; Logger.setLevel clears every logger's level cache,
+    # so fallback loggers are configured once instead of per object
+    return Log(name)
@@ -0,0 +1,13 @@
+from types import MappingProxyType
+from typing import Any
+
+
+def json_default(value: Any) -> Any:
+    # orjson default= hook. Event contents can hold events or shared read-only mappings;
+    # events are matched by their to_dict() so util does not import src
+    if isinstance(value, MappingProxyType):
+        return dict(value)
+    to_dict = getattr(value, "to_dict", None)
+    if callable(to_dict):
+        return to_dict()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
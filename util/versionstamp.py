@@ -4,18 +4,22 @@ Utility function for generating a new version stamp, validating a version stamp,
 """
 from time import time_ns
 from threading import Lock
-from struct import pack
+from struct import Struct
 from random import getrandbits
+from typing import List, Optional
 
 type versionid = str  # Type alias for version stamp, represented as a hex string
 
+# Format parsed once; pack is called for every stamp
+_PACK = Struct(">QHH").pack
+
 class versionstamp:
     def __init__(self) -> None:
         self._prev_time = 0
         self._count = 0
         self._lock = Lock()
 
-    def __call__(self) -> versionid:
+    def __call__(self, now: Optional[int] = None) -> versionid:
         """
         Generate a new version stamp.
         A version stamp is a 16-byte value consisting of:
@@ -23,16 +27,50 @@ class versionstamp:
         - 2 bytes for a counter that increments with each call within the same microsecond.
         - 2 bytes for a random value to ensure uniqueness in case of multiple calls within the same microsecond.
         This method is thread-safe and ensures that each call generates a unique version stamp even if called concurrently.
+        :param now: Current time in microseconds, for callers that have already read the clock.
         :return: A version stamp as a hex string.
         """
+        if now is None:
+            now = time_ns() // 1_000
+        with self._lock:
+            return self._next(now)
+
+    def batch(self, n: int) -> List[versionid]:
+        """
+        Generate n version stamps in increasing order with a single clock read and lock acquisition.
+        Stamps share the current microsecond and take consecutive counter values; if the counter
+        runs out the following microsecond is borrowed, so ordering and uniqueness still hold.
+        :param n: Number of version stamps to generate.
+        :return: A list of version stamps as hex strings.
+        """
         now = time_ns() // 1_000
         with self._lock:
-            if now != self._prev_time:
-                self._prev_time = now
-                self._count = 0
-            else:
-                self._count += 1
-            packed = pack(">QHH", self._prev_time, self._count, getrandbits(16))
-            return packed.hex()
-    
+            return [self._next(now) for _ in range(n)]
+
+    def validate(self, version: versionid) -> bool:
+        """
+        Check that a value is a well-formed version stamp: 24 lowercase hex characters,
+        i.e. the 12 packed bytes as produced by __call__.
+        :param version: The version stamp to check.
+        :return: True if it is well formed.
+        """
+        if len(version) != 24 or version.lower() != version:
+            return False
+        try:
+            # fromhex does the character check in C; it skips whitespace, hence the length check
+            return len(bytes.fromhex(version)) == 12
+        except ValueError:
+            return False
 
+    def _next(self, now: int) -> versionid:
+        # Caller holds self._lock. A clock that steps backwards keeps counting on the last
+        # microsecond instead of reissuing older stamps.
+        if now > self._prev_time:
+            self._prev_time = now
+            self._count = 0
+        elif self._count == 0xFFFF:
+            self._prev_time += 1
+            self._count = 0
+        else:
+            self._count += 1
+        return _PACK(self._prev_time, self._count, getrandbits(16)).hex()